@@ -9,23 +9,25 @@ import subprocess
 import re
 import time
 import socket
+import select
 import os
 import platform
 import json
-import glob
-import shutil
 import threading
-import concurrent.futures
-import hashlib
+import queue
+import heapq
+import gzip
+import ctypes
+import fcntl
+import struct
+import http.client
 import signal
 import sys
-from pathlib import Path
-from collections import defaultdict, deque
-from datetime import datetime, timedelta
-from functools import lru_cache, wraps
-from typing import Dict, List, Tuple, Optional, Any
-from prometheus_client import start_http_server, Gauge, Info, Counter, Histogram, Summary
-from prometheus_client.core import CollectorRegistry
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from collections import Counter as StateCounter
+from functools import lru_cache, partial, wraps
+from prometheus_client import generate_latest, CONTENT_TYPE_LATEST, Gauge, Info, Counter, Histogram, Summary
+from prometheus_client.core import CollectorRegistry, CounterMetricFamily, GaugeMetricFamily
 import logging
 
 # Try to import psutil, install if not available
@@ -36,6 +38,26 @@ except ImportError:
     subprocess.run([sys.executable, '-m', 'pip', 'install', 'psutil'], check=True)
     import psutil
 
+# Optional: with jeepney, systemd is queried over D-Bus instead of by running systemctl
+try:
+    from jeepney import DBusAddress, Properties, new_method_call
+    from jeepney.io.blocking import open_dbus_connection
+    from jeepney.wrappers import unwrap_msg
+except ImportError:
+    open_dbus_connection = None
+
+# Optional: with pynvml (nvidia-ml-py), NVIDIA GPUs are read through NVML in-process
+try:
+    import pynvml
+except ImportError:
+    pynvml = None
+
+# Optional: with orjson, smartctl reports and container API replies are decoded faster
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    json_loads = json.loads
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -48,75 +70,1058 @@ EXPORTER_PORT = int(os.environ.get('EXPORTER_PORT', 9101))
 COLLECTION_INTERVAL = int(os.environ.get('COLLECTION_INTERVAL', 15))
 DEBUG_MODE = os.environ.get('DEBUG_MODE', '').lower() in ('true', '1', 'yes')
 PARALLEL_COLLECTORS = os.environ.get('PARALLEL_COLLECTORS', 'true').lower() in ('true', '1', 'yes')
-MAX_WORKERS = int(os.environ.get('MAX_WORKERS', 4))
+# Collection threads; 0 starts one per enabled collector
+MAX_WORKERS = int(os.environ.get('MAX_WORKERS', 0))
+STRICT_DETECTION = os.environ.get('STRICT_DETECTION', '').lower() in ('true', '1', 'yes')
+MAX_CONTAINER_SERIES = int(os.environ.get('MAX_CONTAINER_SERIES', 500))
+# Detected features are reused across restarts for this long (0 always re-detects)
+FEATURE_CACHE_FILE = os.environ.get('FEATURE_CACHE_FILE', '/var/cache/proxmox-exporter/features.json')
+FEATURE_CACHE_TTL = int(os.environ.get('FEATURE_CACHE_TTL', 86400))
+# Seconds all feature probes together may take; probes still running then count as absent
+DETECTION_TIMEOUT = float(os.environ.get('DETECTION_TIMEOUT', 3))
+# Minimum seconds between runs of collectors that are slow or change slowly;
+# the rest run every COLLECTION_INTERVAL
+COLLECTOR_INTERVALS = {'smart': 300, 'ipmi': 60, 'systemd': 30}
+# Seconds without a scrape before background collection pauses (0 never pauses)
+SCRAPE_IDLE_TIMEOUT = int(os.environ.get('SCRAPE_IDLE_TIMEOUT', 300))
 
 if DEBUG_MODE:
     logger.setLevel(logging.DEBUG)
 
+# Keyword arguments for every tool run. Tools inherit the exporter's
+# environment with the C locale forced, so numbers parse with '.' decimal points
+_RUN_KW = {
+    'capture_output': True,
+    'text': True,
+    'env': {**os.environ, 'LC_ALL': 'C'},
+}
+
+# Set from the signal handler; the main loop waits on it between collections
+shutdown_requested = threading.Event()
+
+# Metric definitions: (attribute, type, name, description, labels)
+BASE_METRICS = [
+    # Node information
+    ('node_info', Info, 'node', 'Node information', None),
+    ('node_features', Info, 'node_features', 'Detected node features', None),
+    ('pve_version', Info, 'pve_version', 'Proxmox VE version', None),
+    ('boot_time', Gauge, 'node_boot_time_seconds', 'Node boot time', None),
+    ('uptime_seconds', Gauge, 'node_uptime_seconds', 'System uptime in seconds', None),
+
+    # CPU metrics
+    ('cpu_count', Gauge, 'node_cpu_count', 'Number of CPUs', ['type']),
+    ('cpu_usage', Gauge, 'node_cpu_seconds_total', 'CPU time spent', ['cpu', 'mode']),
+    ('cpu_percent', Gauge, 'node_cpu_usage_percent', 'CPU usage percentage', ['cpu']),
+    ('cpu_frequency', Gauge, 'node_cpu_frequency_hertz', 'CPU frequency', ['cpu', 'type']),
+    ('load_1', Gauge, 'node_load1', '1 minute load average', None),
+    ('load_5', Gauge, 'node_load5', '5 minute load average', None),
+    ('load_15', Gauge, 'node_load15', '15 minute load average', None),
+
+    # Memory metrics
+    ('memory_total', Gauge, 'node_memory_MemTotal_bytes', 'Total memory', None),
+    ('memory_free', Gauge, 'node_memory_MemFree_bytes', 'Free memory', None),
+    ('memory_available', Gauge, 'node_memory_MemAvailable_bytes', 'Available memory', None),
+    ('memory_cached', Gauge, 'node_memory_Cached_bytes', 'Cached memory', None),
+    ('memory_buffers', Gauge, 'node_memory_Buffers_bytes', 'Buffer memory', None),
+    ('memory_shared', Gauge, 'node_memory_Shared_bytes', 'Shared memory', None),
+    ('memory_slab', Gauge, 'node_memory_Slab_bytes', 'Slab memory', None),
+    ('memory_pressure_ratio', Gauge, 'node_memory_pressure_ratio', 'Memory pressure ratio', None),
+    ('swap_total', Gauge, 'node_memory_SwapTotal_bytes', 'Total swap', None),
+    ('swap_free', Gauge, 'node_memory_SwapFree_bytes', 'Free swap', None),
+    ('swap_used_percent', Gauge, 'node_memory_swap_used_percent', 'Swap usage percentage', None),
+
+    # Process metrics
+    ('processes_running', Gauge, 'node_procs_running', 'Running processes', None),
+    ('processes_blocked', Gauge, 'node_procs_blocked', 'Blocked processes', None),
+    ('processes_total', Gauge, 'node_procs_total', 'Total processes', None),
+    ('threads_total', Gauge, 'node_threads_total', 'Total threads', None),
+]
+
+ADVANCED_METRICS = [
+    # TCP/UDP connection metrics
+    ('tcp_connections', Gauge, 'node_network_tcp_connections', 'TCP connections by state', ['state']),
+    ('udp_connections', Gauge, 'node_network_udp_connections', 'UDP connections', ['state']),
+
+    # File descriptors
+    ('fd_allocated', Gauge, 'node_filefd_allocated', 'Allocated file descriptors', None),
+    ('fd_maximum', Gauge, 'node_filefd_maximum', 'Maximum file descriptors', None),
+
+    # Entropy
+    ('entropy_available', Gauge, 'node_entropy_available_bits', 'Available entropy', None),
+
+    # Time metrics
+    ('time_seconds', Gauge, 'node_time_seconds', 'System time', None),
+    ('time_zone_offset', Gauge, 'node_time_zone_offset_seconds', 'Time zone offset', None),
+
+    # Kernel metrics
+    ('kernel_version', Info, 'node_kernel_version', 'Kernel version info', None),
+
+    # Top processes: usage per rank, plus an identity series per rank that
+    # only changes when a different process takes that rank
+    ('top_cpu_percent', Gauge, 'node_top_cpu_process_percent', 'CPU usage of the top CPU consuming processes', ['rank']),
+    ('top_cpu_process', Gauge, 'node_top_cpu_process_info', 'Top CPU consuming processes', ['rank', 'name', 'pid']),
+    ('top_mem_percent', Gauge, 'node_top_memory_process_percent', 'Memory usage of the top memory consuming processes', ['rank']),
+    ('top_mem_process', Gauge, 'node_top_memory_process_info', 'Top memory consuming processes', ['rank', 'name', 'pid']),
+]
+
+TEMPERATURE_METRICS = [
+    ('temp_celsius', Gauge, 'node_hwmon_temp_celsius', 'Temperature in Celsius', ['chip', 'sensor', 'label']),
+    ('temp_max', Gauge, 'node_hwmon_temp_max_celsius', 'Maximum temperature', ['chip', 'sensor', 'label']),
+    ('temp_crit', Gauge, 'node_hwmon_temp_crit_celsius', 'Critical temperature', ['chip', 'sensor', 'label']),
+    ('temp_alarm', Gauge, 'node_hwmon_temp_alarm', 'Temperature alarm', ['chip', 'sensor', 'label']),
+    ('fan_rpm', Gauge, 'node_hwmon_fan_rpm', 'Fan speed RPM', ['chip', 'sensor']),
+    ('fan_min', Gauge, 'node_hwmon_fan_min_rpm', 'Minimum fan speed', ['chip', 'sensor']),
+    ('power_watts', Gauge, 'node_hwmon_power_watt', 'Power consumption', ['chip', 'sensor']),
+    ('voltage_volts', Gauge, 'node_hwmon_voltage_volts', 'Voltage', ['chip', 'sensor']),
+    ('current_amps', Gauge, 'node_hwmon_curr_amps', 'Current', ['chip', 'sensor']),
+]
+
+GPU_METRICS = [
+    ('gpu_info', Info, 'node_gpu_info', 'GPU information', None),
+    ('gpu_count', Gauge, 'node_gpu_count', 'Number of GPUs', ['vendor']),
+
+    # Common GPU metrics
+    ('gpu_temp', Gauge, 'node_gpu_temp_celsius', 'GPU temperature', ['gpu', 'name', 'vendor']),
+    ('gpu_utilization', Gauge, 'node_gpu_utilization_percent', 'GPU utilization', ['gpu', 'name', 'vendor', 'type']),
+    ('gpu_memory_total', Gauge, 'node_gpu_memory_total_bytes', 'GPU memory total', ['gpu', 'name', 'vendor']),
+    ('gpu_memory_used', Gauge, 'node_gpu_memory_used_bytes', 'GPU memory used', ['gpu', 'name', 'vendor']),
+    ('gpu_memory_free', Gauge, 'node_gpu_memory_free_bytes', 'GPU memory free', ['gpu', 'name', 'vendor']),
+    ('gpu_power_draw', Gauge, 'node_gpu_power_draw_watts', 'GPU power draw', ['gpu', 'name', 'vendor']),
+    ('gpu_power_limit', Gauge, 'node_gpu_power_limit_watts', 'GPU power limit', ['gpu', 'name', 'vendor']),
+    ('gpu_clock_graphics', Gauge, 'node_gpu_clock_graphics_hertz', 'GPU graphics clock', ['gpu', 'name', 'vendor']),
+    ('gpu_clock_memory', Gauge, 'node_gpu_clock_memory_hertz', 'GPU memory clock', ['gpu', 'name', 'vendor']),
+    ('gpu_fan_speed', Gauge, 'node_gpu_fan_speed_percent', 'GPU fan speed', ['gpu', 'name', 'vendor']),
+    ('gpu_pcie_link_gen', Gauge, 'node_gpu_pcie_link_gen', 'PCIe link generation', ['gpu', 'name', 'vendor']),
+    ('gpu_pcie_link_width', Gauge, 'node_gpu_pcie_link_width', 'PCIe link width', ['gpu', 'name', 'vendor']),
+    ('gpu_throttle_reason', Gauge, 'node_gpu_throttle_reasons', 'GPU throttle reasons', ['gpu', 'name', 'vendor', 'reason']),
+]
+
+ZFS_METRICS = [
+    # ARC metrics
+    ('zfs_arc_size', Gauge, 'node_zfs_arc_size_bytes', 'ZFS ARC size', None),
+    ('zfs_arc_c', Gauge, 'node_zfs_arc_c_bytes', 'ZFS ARC target size', None),
+    ('zfs_arc_c_min', Gauge, 'node_zfs_arc_c_min_bytes', 'ZFS ARC minimum size', None),
+    ('zfs_arc_c_max', Gauge, 'node_zfs_arc_c_max_bytes', 'ZFS ARC maximum size', None),
+    ('zfs_arc_hit_ratio', Gauge, 'node_zfs_arc_hit_ratio', 'ZFS ARC hit ratio', None),
+
+    # L2ARC metrics
+    ('zfs_l2arc_size', Gauge, 'node_zfs_l2arc_size_bytes', 'ZFS L2ARC size', None),
+
+    # Pool metrics
+    ('zpool_scrub_state', Gauge, 'node_zfs_zpool_scrub_state', 'ZFS pool scrub state', ['pool', 'state']),
+    ('zpool_errors', Counter, 'node_zfs_zpool_errors_total', 'ZFS pool errors', ['pool', 'type']),
+]
+
+VM_METRICS = [
+    ('vm_count', Gauge, 'pve_vm_count', 'Number of VMs/Containers', ['type', 'status']),
+    ('vm_cpu_usage', Gauge, 'pve_vm_cpu_usage_percent', 'VM CPU usage', ['vmid', 'name', 'type']),
+    ('vm_disk_read', Counter, 'pve_vm_disk_read_bytes_total', 'VM disk read bytes', ['vmid', 'name', 'type']),
+    ('vm_disk_write', Counter, 'pve_vm_disk_write_bytes_total', 'VM disk write bytes', ['vmid', 'name', 'type']),
+    ('vm_net_rx', Counter, 'pve_vm_network_receive_bytes_total', 'VM network receive bytes', ['vmid', 'name', 'type']),
+    ('vm_net_tx', Counter, 'pve_vm_network_transmit_bytes_total', 'VM network transmit bytes', ['vmid', 'name', 'type']),
+]
+
+CONTAINER_METRICS = [
+    ('container_count', Gauge, 'node_container_count', 'Number of containers', ['runtime', 'state']),
+    ('container_network_rx', Counter, 'node_container_network_receive_bytes_total', 'Container network RX', ['name', 'id', 'runtime']),
+    ('container_network_tx', Counter, 'node_container_network_transmit_bytes_total', 'Container network TX', ['name', 'id', 'runtime']),
+    ('container_status', Gauge, 'node_container_status', 'Container status', ['name', 'id', 'runtime', 'status']),
+    ('container_restarts', Counter, 'node_container_restarts_total', 'Container restart count', ['name', 'id', 'runtime']),
+]
+
+SMART_METRICS = [
+    ('smart_healthy', Gauge, 'node_disk_smart_healthy', 'SMART health status', ['device', 'model', 'serial']),
+    ('smart_temperature', Gauge, 'node_disk_smart_temperature_celsius', 'Disk temperature', ['device', 'model']),
+    ('smart_reallocated_sectors', Gauge, 'node_disk_smart_reallocated_sectors', 'Reallocated sectors', ['device', 'model']),
+    ('smart_pending_sectors', Gauge, 'node_disk_smart_pending_sectors', 'Pending sectors', ['device', 'model']),
+    ('smart_uncorrectable_sectors', Gauge, 'node_disk_smart_uncorrectable_sectors', 'Uncorrectable sectors', ['device', 'model']),
+    ('smart_raw_read_error_rate', Gauge, 'node_disk_smart_raw_read_error_rate', 'Raw read error rate', ['device', 'model']),
+    ('smart_seek_error_rate', Gauge, 'node_disk_smart_seek_error_rate', 'Seek error rate', ['device', 'model']),
+    ('smart_spin_retry_count', Gauge, 'node_disk_smart_spin_retry_count', 'Spin retry count', ['device', 'model']),
+    ('smart_ssd_wearout', Gauge, 'node_disk_smart_ssd_wearout_percent', 'SSD wearout indicator', ['device', 'model']),
+]
+
+IPMI_METRICS = [
+    ('ipmi_sensor_value', Gauge, 'node_ipmi_sensor_value', 'IPMI sensor value', ['name', 'type', 'unit']),
+    ('ipmi_sensor_state', Gauge, 'node_ipmi_sensor_state', 'IPMI sensor state', ['name', 'type', 'state']),
+    ('ipmi_fan_speed', Gauge, 'node_ipmi_fan_speed_rpm', 'IPMI fan speed', ['name']),
+    ('ipmi_temperature', Gauge, 'node_ipmi_temperature_celsius', 'IPMI temperature', ['name', 'location']),
+    ('ipmi_voltage', Gauge, 'node_ipmi_voltage_volts', 'IPMI voltage', ['name', 'rail']),
+    ('ipmi_power', Gauge, 'node_ipmi_power_watts', 'IPMI power consumption', ['name']),
+]
+
+SYSTEMD_METRICS = [
+    ('systemd_unit_start_time', Gauge, 'node_systemd_unit_start_time_seconds', 'Unit start time', ['name']),
+    ('systemd_system_running', Gauge, 'node_systemd_system_running', 'Systemd system state', None),
+    ('systemd_units_total', Gauge, 'node_systemd_units', 'Total systemd units by state', ['state']),
+    ('systemd_timer_last_trigger', Gauge, 'node_systemd_timer_last_trigger_seconds', 'Timer last trigger', ['name']),
+]
+
+MDADM_METRICS = [
+    ('mdadm_array_state', Gauge, 'node_md_state', 'MD array state', ['device', 'state']),
+    ('mdadm_disks_total', Gauge, 'node_md_disks', 'Total disks in array', ['device']),
+    ('mdadm_disks_active', Gauge, 'node_md_disks_active', 'Active disks in array', ['device']),
+    ('mdadm_disks_failed', Gauge, 'node_md_disks_failed', 'Failed disks in array', ['device']),
+    ('mdadm_disks_spare', Gauge, 'node_md_disks_spare', 'Spare disks in array', ['device']),
+    ('mdadm_blocks_total', Gauge, 'node_md_blocks_total', 'Total blocks in array', ['device']),
+    ('mdadm_blocks_synced', Gauge, 'node_md_blocks_synced', 'Synced blocks in array', ['device']),
+    ('mdadm_sync_action', Info, 'node_md_sync_action', 'Current sync action', None),
+    ('mdadm_sync_completed', Gauge, 'node_md_sync_completed_percent', 'Sync completion percentage', ['device']),
+    ('mdadm_sync_speed', Gauge, 'node_md_sync_speed_kb_per_sec', 'Sync speed', ['device']),
+]
+
+UPS_METRICS = [
+    ('ups_status', Info, 'node_ups_status', 'UPS status information', None),
+    ('ups_battery_charge', Gauge, 'node_ups_battery_charge_percent', 'Battery charge percentage', ['ups']),
+    ('ups_battery_runtime', Gauge, 'node_ups_battery_runtime_seconds', 'Battery runtime remaining', ['ups']),
+    ('ups_battery_voltage', Gauge, 'node_ups_battery_voltage', 'Battery voltage', ['ups']),
+    ('ups_input_voltage', Gauge, 'node_ups_input_voltage', 'Input voltage', ['ups']),
+    ('ups_output_voltage', Gauge, 'node_ups_output_voltage', 'Output voltage', ['ups']),
+    ('ups_load_percent', Gauge, 'node_ups_load_percent', 'UPS load percentage', ['ups']),
+    ('ups_temperature', Gauge, 'node_ups_temperature_celsius', 'UPS temperature', ['ups']),
+    ('ups_on_battery', Gauge, 'node_ups_on_battery', 'UPS is on battery power', ['ups']),
+]
+
+BTRFS_METRICS = [
+    ('btrfs_allocation', Gauge, 'node_btrfs_allocation_bytes', 'Btrfs allocation', ['uuid', 'label', 'type']),
+    ('btrfs_used', Gauge, 'node_btrfs_used_bytes', 'Btrfs used space', ['uuid', 'label', 'type']),
+    ('btrfs_device_size', Gauge, 'node_btrfs_device_size_bytes', 'Btrfs device size', ['uuid', 'label', 'device']),
+    ('btrfs_device_errors', Counter, 'node_btrfs_device_errors_total', 'Btrfs device errors', ['uuid', 'label', 'device', 'type']),
+]
+
+EXPORTER_METRICS = [
+    ('collection_errors', Counter, 'node_exporter_collection_errors_total', 'Collection errors', ['collector']),
+    ('collection_duration', Histogram, 'node_exporter_collection_duration_seconds', 'Collection duration', ['collector']),
+    ('collection_success', Gauge, 'node_exporter_collection_success', 'Collection success', ['collector']),
+    ('feature_enabled', Gauge, 'node_exporter_feature_enabled', 'Feature detection status', ['feature']),
+    ('exporter_info', Info, 'node_exporter_info', 'Exporter information', None),
+    ('scrape_collector_duration', Summary, 'node_scrape_collector_duration_seconds', 'Duration of a collector scrape', ['collector']),
+    ('scrape_collector_success', Gauge, 'node_scrape_collector_success', 'Whether a collector succeeded', ['collector']),
+    ('cardinality_overflow', Counter, 'node_exporter_cardinality_overflow_total', 'Samples folded into an __other__ series', ['metric']),
+]
+
+# /proc/meminfo fields used by the memory collector
+MEMINFO_FIELDS = frozenset((
+    b'MemTotal', b'MemFree', b'MemAvailable', b'Buffers', b'Cached',
+    b'SReclaimable', b'Shmem', b'Slab', b'SwapTotal', b'SwapFree',
+))
+
+# Modes exported for node_cpu_seconds_total, and their column in a /proc/stat cpuN line
+CPU_MODES = ('user', 'system', 'idle', 'iowait', 'irq', 'softirq', 'steal', 'guest')
+CPU_STAT_FIELDS = (0, 2, 3, 4, 5, 6, 7, 8)
+
+# /proc/net/tcp{,6} socket states, named the way psutil reports them
+TCP_STATES = {
+    b'01': 'ESTABLISHED', b'02': 'SYN_SENT', b'03': 'SYN_RECV', b'04': 'FIN_WAIT1',
+    b'05': 'FIN_WAIT2', b'06': 'TIME_WAIT', b'07': 'CLOSE', b'08': 'CLOSE_WAIT',
+    b'09': 'LAST_ACK', b'0A': 'LISTEN', b'0B': 'CLOSING',
+}
+
+CLOCK_TICKS = os.sysconf('SC_CLK_TCK')
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE')
+
+DOCKER_SOCKET = '/var/run/docker.sock'
+# Rootful podman.socket and the libpod API version prefix it is queried with
+PODMAN_SOCKET = '/run/podman/podman.sock'
+PODMAN_API = '/v4.0.0/libpod'
+# Size suffixes in container CLI output, e.g. '1.5GiB' or '512kB'
+_MEMORY_UNITS = {
+    'B': 1, 'KiB': 1024, 'MiB': 1024**2, 'GiB': 1024**3, 'TiB': 1024**4,
+    'kB': 1000, 'KB': 1000, 'MB': 1000**2, 'GB': 1000**3, 'TB': 1000**4,
+}
+
+# Patterns compiled once at import instead of on every call
+_RE_MD_ARRAY = re.compile(rb'^md\d+\s*:', re.M)
+# Only the wanted /proc/meminfo lines match; their values are in kB
+_RE_MEMINFO = re.compile(rb'^(' + b'|'.join(MEMINFO_FIELDS) + rb'):\s+(\d+)', re.M)
+_RE_PVE_VERSION = re.compile(r'^pve-manager[:/]\s*([^\s/]+)', re.M)
+_RE_MD_SYNC_PERCENT = re.compile(rb'(\d+\.\d+)%')
+_RE_MD_SYNC_SPEED = re.compile(rb'speed=(\d+)K/sec')
+_RE_MOUNT_ESCAPE = re.compile(r'\\([0-7]{3})')
+# arcstats rows after the kstat header: name type data
+_RE_ARCSTATS = re.compile(rb'^(\w+) +\d+ +(\d+)$', re.M)
+# `ipmitool sensor` rows with a numeric reading: name | value | unit | state | thresholds...
+_RE_IPMI_READING = re.compile(r'^(\S[^|\n]*?)\s*\|\s*(-?\d+(?:\.\d+)?)\s*\|\s*([^|\n]*?)\s*\|\s*(\w+)', re.M)
+# Printed by `ipmitool shell` once a command's output is complete
+IPMI_SHELL_PROMPT = b'ipmitool> '
+
+# Per-device metric families rebuilt on every collection: (key, type, name, description)
+FILESYSTEM_FAMILIES = [
+    ('size', GaugeMetricFamily, 'node_filesystem_size_bytes', 'Filesystem size'),
+    ('free', GaugeMetricFamily, 'node_filesystem_free_bytes', 'Filesystem free'),
+    ('avail', GaugeMetricFamily, 'node_filesystem_avail_bytes', 'Filesystem available'),
+    ('files', GaugeMetricFamily, 'node_filesystem_files', 'Total file nodes'),
+    ('files_free', GaugeMetricFamily, 'node_filesystem_files_free', 'Free file nodes'),
+    ('readonly', GaugeMetricFamily, 'node_filesystem_readonly', 'Filesystem is read-only'),
+]
+
+DISK_FAMILIES = [
+    ('read_bytes', CounterMetricFamily, 'node_disk_read_bytes_total', 'Disk bytes read'),
+    ('written_bytes', CounterMetricFamily, 'node_disk_written_bytes_total', 'Disk bytes written'),
+    ('reads_completed', CounterMetricFamily, 'node_disk_reads_completed_total', 'Disk reads completed'),
+    ('writes_completed', CounterMetricFamily, 'node_disk_writes_completed_total', 'Disk writes completed'),
+    ('read_time', CounterMetricFamily, 'node_disk_read_time_seconds_total', 'Time spent reading'),
+    ('write_time', CounterMetricFamily, 'node_disk_write_time_seconds_total', 'Time spent writing'),
+    ('io_time', CounterMetricFamily, 'node_disk_io_time_seconds_total', 'Disk I/O time'),
+    ('io_now', GaugeMetricFamily, 'node_disk_io_now', 'Number of I/Os in progress'),
+    ('utilization', GaugeMetricFamily, 'node_disk_utilization', 'Disk utilization percentage'),
+]
+
+NETWORK_FAMILIES = [
+    ('bytes_recv', CounterMetricFamily, 'node_network_receive_bytes_total', 'Network bytes received'),
+    ('bytes_sent', CounterMetricFamily, 'node_network_transmit_bytes_total', 'Network bytes sent'),
+    ('packets_recv', CounterMetricFamily, 'node_network_receive_packets_total', 'Network packets received'),
+    ('packets_sent', CounterMetricFamily, 'node_network_transmit_packets_total', 'Network packets sent'),
+    ('errs_recv', CounterMetricFamily, 'node_network_receive_errs_total', 'Network receive errors'),
+    ('errs_sent', CounterMetricFamily, 'node_network_transmit_errs_total', 'Network transmit errors'),
+    ('drop_recv', CounterMetricFamily, 'node_network_receive_drop_total', 'Network receive drops'),
+    ('drop_sent', CounterMetricFamily, 'node_network_transmit_drop_total', 'Network transmit drops'),
+    ('speed', GaugeMetricFamily, 'node_network_speed_bytes', 'Network interface speed'),
+    ('mtu', GaugeMetricFamily, 'node_network_mtu_bytes', 'Network interface MTU'),
+    ('up', GaugeMetricFamily, 'node_network_up', 'Network interface is up'),
+]
+
+# Filesystems whose statvfs never leaves the host; anything else (NFS, CIFS,
+# FUSE, ceph...) is probed from a helper thread with a bounded wait
+LOCAL_FILESYSTEMS = frozenset(('ext2', 'ext3', 'ext4', 'xfs', 'btrfs', 'zfs', 'vfat', 'f2fs'))
+SLOW_STATVFS_TIMEOUT = 0.5
+
+# Per-container usage, rebuilt each collection so removed containers drop out
+CONTAINER_FAMILIES = [
+    ('cpu', GaugeMetricFamily, 'node_container_cpu_usage_percent', 'Container CPU usage'),
+    ('memory', GaugeMetricFamily, 'node_container_memory_usage_bytes', 'Container memory usage'),
+    ('memory_limit', GaugeMetricFamily, 'node_container_memory_limit_bytes', 'Container memory limit'),
+]
+
+# hwmon input name prefix -> (gauge attribute, divisor); inputs are in mV, mA and μW
+HWMON_INPUTS = {
+    'in': ('voltage_volts', 1000),
+    'curr': ('current_amps', 1000),
+    'power': ('power_watts', 1000000),
+}
+
+# hwmon temperature file suffix -> gauge attribute; values are in millidegrees
+HWMON_TEMP_FIELDS = {
+    '_input': 'temp_celsius',
+    '_max': 'temp_max',
+    '_crit': 'temp_crit',
+}
+
+# ARC lifetime counters from arcstats, keyed by kstat name
+ZFS_ARC_COUNTER_FAMILIES = [
+    (b'hits', CounterMetricFamily, 'node_zfs_arc_hits_total', 'ZFS ARC hits'),
+    (b'misses', CounterMetricFamily, 'node_zfs_arc_misses_total', 'ZFS ARC misses'),
+    (b'l2_hits', CounterMetricFamily, 'node_zfs_l2arc_hits_total', 'ZFS L2ARC hits'),
+    (b'l2_misses', CounterMetricFamily, 'node_zfs_l2arc_misses_total', 'ZFS L2ARC misses'),
+]
+
+# arcstats kstat name -> ARC gauge attribute
+ZFS_ARC_GAUGES = {
+    b'size': 'zfs_arc_size',
+    b'c': 'zfs_arc_c',
+    b'c_min': 'zfs_arc_c_min',
+    b'c_max': 'zfs_arc_c_max',
+    b'l2_size': 'zfs_l2arc_size',
+}
+
+# arcstats eviction kstat name -> type label of the evicted bytes counter
+ZFS_ARC_EVICT_TYPES = {
+    b'evict_l2_cached': 'l2_cached',
+    b'evict_l2_eligible': 'l2_eligible',
+    b'evict_l2_ineligible': 'l2_ineligible',
+}
+
+# Per-pool state, rebuilt from the pool listing on each collection; keys after
+# health are the `zpool list` columns that fill them, in listing order
+ZPOOL_FAMILIES = [
+    ('health', GaugeMetricFamily, 'node_zfs_zpool_health', 'ZFS pool health (0=online, 1=degraded, 2=faulted)'),
+    ('size', GaugeMetricFamily, 'node_zfs_zpool_size_bytes', 'ZFS pool size'),
+    ('allocated', GaugeMetricFamily, 'node_zfs_zpool_allocated_bytes', 'ZFS pool allocated'),
+    ('free', GaugeMetricFamily, 'node_zfs_zpool_free_bytes', 'ZFS pool free'),
+    ('fragmentation', GaugeMetricFamily, 'node_zfs_zpool_fragmentation_percent', 'ZFS pool fragmentation'),
+    ('dedupratio', GaugeMetricFamily, 'node_zfs_zpool_deduplication_ratio', 'ZFS pool deduplication ratio'),
+]
+
+# zpool health -> gauge value; every other state (FAULTED, UNAVAIL, SUSPENDED...) is 2
+ZPOOL_HEALTH = {'ONLINE': 0, 'DEGRADED': 1}
+
+# Per-guest state, rebuilt from the guest configs on each collection
+VM_FAMILIES = [
+    ('status', GaugeMetricFamily, 'pve_vm_status', 'VM status (1=running, 0=stopped)'),
+    ('memory_total', GaugeMetricFamily, 'pve_vm_memory_total_bytes', 'VM total memory'),
+    ('memory_used', GaugeMetricFamily, 'pve_vm_memory_used_bytes', 'VM used memory'),
+    ('uptime', GaugeMetricFamily, 'pve_vm_uptime_seconds', 'VM uptime'),
+]
+
+# Proxmox guest types: (feature, type label, config directory, config key holding the name)
+PVE_GUEST_TYPES = (
+    ('qemu_vms', 'qemu', '/etc/pve/qemu-server', 'name'),
+    ('lxc_containers', 'lxc', '/etc/pve/lxc', 'hostname'),
+)
+
+# Guest cgroup root and memory usage file. PVE 7+ runs the unified cgroup v2
+# tree; hosts still on v1 keep guests under the memory controller's hierarchy
+if os.path.exists('/sys/fs/cgroup/cgroup.controllers'):
+    GUEST_CGROUP_ROOT, GUEST_MEMORY_FILE = '/sys/fs/cgroup', 'memory.current'
+else:
+    GUEST_CGROUP_ROOT, GUEST_MEMORY_FILE = '/sys/fs/cgroup/memory', 'memory.usage_in_bytes'
+
+# Per-unit systemd state, rebuilt from each unit listing
+SYSTEMD_FAMILIES = [
+    ('units', GaugeMetricFamily, 'node_systemd_unit_state', 'Systemd unit state'),
+]
+
+# SMART lifetime counters as reported by the drive
+SMART_COUNTER_FAMILIES = [
+    ('power_on_hours', CounterMetricFamily, 'node_disk_smart_power_on_hours', 'Power on hours'),
+    ('power_cycles', CounterMetricFamily, 'node_disk_smart_power_cycles', 'Power cycles'),
+]
+
+# ATA SMART attribute id -> gauge attribute set from its raw value
+SMART_ATTRIBUTES = {
+    1: 'smart_raw_read_error_rate',
+    5: 'smart_reallocated_sectors',
+    7: 'smart_seek_error_rate',
+    10: 'smart_spin_retry_count',
+    197: 'smart_pending_sectors',
+    198: 'smart_uncorrectable_sectors',
+}
+# ATA attributes whose normalized value is the remaining SSD life in percent
+SMART_WEAR_ATTRIBUTES = frozenset((177, 231, 233))
+# SMART attributes change over minutes, and smartctl can wake or stall a drive
+SMART_CACHE_TTL = 300
+
+# NVME_IOCTL_ADMIN_CMD: _IOWR('N', 0x41, struct nvme_admin_cmd), a 72-byte command
+NVME_IOCTL_ADMIN_CMD = 0xC0484E41
+# Get Log Page for the 512-byte SMART / Health Information log (log id 2), all namespaces
+NVME_SMART_LOG_CMD = struct.pack('=BBHIIIQQII6III', 0x02, 0, 0, 0xFFFFFFFF, 0, 0, 0, 0, 0, 512,
+                                 (512 // 4 - 1) << 16 | 0x02, 0, 0, 0, 0, 0, 0, 0)
+# Seconds between pveversion runs; the version only changes on an upgrade
+PVE_VERSION_TTL = 3600
+
+# nvmlClocksThrottleReason bits exported by node_gpu_throttle_reasons
+NVML_THROTTLE_REASONS = {
+    'gpu_idle': 0x1, 'applications_clocks_setting': 0x2, 'sw_power_cap': 0x4,
+    'hw_slowdown': 0x8, 'sync_boost': 0x10, 'sw_thermal_slowdown': 0x20,
+    'hw_thermal_slowdown': 0x40, 'hw_power_brake_slowdown': 0x80,
+}
+
+# nvidia-smi --query-gpu fields read after index and name:
+# (field, gauge attribute, utilization type label or None, scale to base units)
+NVIDIA_SMI_FIELDS = (
+    ('temperature.gpu', 'gpu_temp', None, 1),
+    ('utilization.gpu', 'gpu_utilization', 'gpu', 1),
+    ('utilization.memory', 'gpu_utilization', 'memory', 1),
+    ('memory.total', 'gpu_memory_total', None, 1048576),
+    ('memory.used', 'gpu_memory_used', None, 1048576),
+    ('memory.free', 'gpu_memory_free', None, 1048576),
+    ('power.draw', 'gpu_power_draw', None, 1),
+    ('power.limit', 'gpu_power_limit', None, 1),
+    ('clocks.gr', 'gpu_clock_graphics', None, 1000000),
+    ('clocks.mem', 'gpu_clock_memory', None, 1000000),
+    ('fan.speed', 'gpu_fan_speed', None, 1),
+    ('pcie.link.gen.current', 'gpu_pcie_link_gen', None, 1),
+    ('pcie.link.width.current', 'gpu_pcie_link_width', None, 1),
+)
+
+# amdgpu sysfs files relative to the card's device directory, 'hwmon/' ones in its
+# hwmon directory: (file, gauge attribute, utilization type label or None, scale to
+# base units). Where two files feed one gauge, the first one present is used
+AMD_SYSFS_FIELDS = (
+    ('hwmon/temp1_input', 'gpu_temp', None, 0.001),
+    ('gpu_busy_percent', 'gpu_utilization', 'gpu', 1),
+    ('mem_busy_percent', 'gpu_utilization', 'memory', 1),
+    ('mem_info_vram_total', 'gpu_memory_total', None, 1),
+    ('mem_info_vram_used', 'gpu_memory_used', None, 1),
+    ('hwmon/power1_average', 'gpu_power_draw', None, 0.000001),
+    ('hwmon/power1_input', 'gpu_power_draw', None, 0.000001),
+    ('hwmon/power1_cap', 'gpu_power_limit', None, 0.000001),
+    ('hwmon/freq1_input', 'gpu_clock_graphics', None, 1),
+    ('hwmon/freq2_input', 'gpu_clock_memory', None, 1),
+    ('hwmon/pwm1', 'gpu_fan_speed', None, 100 / 255),
+    ('current_link_width', 'gpu_pcie_link_width', None, 1),
+)
+
+# ipmitool sensor unit -> sensor type
+IPMI_UNIT_TYPES = {
+    'degrees C': 'temperature', 'RPM': 'fan', 'Volts': 'voltage', 'Watts': 'power', 'Amps': 'current',
+}
+
+# Monotonic kernel counters, republished as read from procfs/sysfs
+KERNEL_COUNTER_FAMILIES = [
+    (b'ctxt', CounterMetricFamily, 'node_context_switches_total', 'Total context switches'),
+    (b'intr', CounterMetricFamily, 'node_intr_total', 'Total interrupts'),
+    (b'processes', CounterMetricFamily, 'node_forks_total', 'Total forks since boot'),
+    (b'pgfault', CounterMetricFamily, 'node_vmstat_pgfault', 'Page faults'),
+    (b'pgmajfault', CounterMetricFamily, 'node_vmstat_pgmajfault', 'Major page faults'),
+    (b'pswpin', CounterMetricFamily, 'node_vmstat_pswpin', 'Pages swapped in'),
+    (b'pswpout', CounterMetricFamily, 'node_vmstat_pswpout', 'Pages swapped out'),
+]
+
+THROTTLE_FAMILIES = [
+    ('throttles', CounterMetricFamily, 'node_cpu_throttles_total', 'CPU throttling events'),
+]
+
+def build_families(table, labels):
+    """Create empty metric families keyed by their table key"""
+    return {key: family_cls(name, documentation, labels=labels) for key, family_cls, name, documentation in table}
+
 class MetricCache:
     """Simple TTL cache for expensive operations"""
+    __slots__ = ('cache', 'default_ttl', 'lock')
+    
     def __init__(self, default_ttl=60):
         self.cache = {}
         self.default_ttl = default_ttl
+        # Collectors fill the cache from worker threads while the main loop
+        # expires it; the lock only covers the dict, never compute_func
+        self.lock = threading.Lock()
     
     def get(self, key, compute_func, ttl=None):
         """Get value from cache or compute it"""
-        if ttl is None:
-            ttl = self.default_ttl
-        
         now = time.time()
-        if key in self.cache:
-            value, expiry = self.cache[key]
-            if now < expiry:
-                return value
+        entry = self.cache.get(key)
+        if entry is not None and now < entry[1]:
+            return entry[0]
         
         value = compute_func()
-        self.cache[key] = (value, now + ttl)
+        with self.lock:
+            self.cache[key] = (value, now + (self.default_ttl if ttl is None else ttl))
         return value
     
     def clear_expired(self):
         """Remove expired entries"""
         now = time.time()
-        expired = [k for k, (_, exp) in self.cache.items() if now >= exp]
-        for k in expired:
-            del self.cache[k]
+        with self.lock:
+            for key in [k for k, v in self.cache.items() if now >= v[1]]:
+                del self.cache[key]
 
 class RateLimiter:
-    """Rate limiter for expensive operations"""
+    """Token bucket rate limiter for expensive operations"""
+    __slots__ = ('max_calls', 'period', 'rate', 'tokens', 'last')
+    
     def __init__(self, max_calls=10, period=60):
         self.max_calls = max_calls
         self.period = period
-        self.calls = deque()
+        self.rate = max_calls / period
+        self.tokens = float(max_calls)
+        self.last = time.monotonic()
     
     def allow(self):
         """Check if operation is allowed"""
-        now = time.time()
-        # Remove old calls
-        while self.calls and self.calls[0] <= now - self.period:
-            self.calls.popleft()
+        now = time.monotonic()
+        # Refill tokens for the time elapsed since the last call
+        self.tokens = min(self.max_calls, self.tokens + (now - self.last) * self.rate)
+        self.last = now
         
-        if len(self.calls) < self.max_calls:
-            self.calls.append(now)
+        if self.tokens >= 1:
+            self.tokens -= 1
             return True
         return False
 
-def timed_operation(timeout=5):
-    """Decorator to add timeout to operations"""
+def _read_small(path, size=64, dir_fd=None):
+    """Read a small sysfs/procfs file without Python's buffered I/O layers"""
+    fd = os.open(path, os.O_RDONLY, dir_fd=dir_fd)
+    try:
+        return os.read(fd, size)
+    finally:
+        os.close(fd)
+
+# Descriptors for procfs and sysfs files re-read every collection, by path
+_proc_fds = {}
+
+def _read_proc(path, size=65536):
+    """Read a whole procfs or sysfs file through a descriptor kept open across calls"""
+    fd = _proc_fds.get(path)
+    if fd is None:
+        new_fd = os.open(path, os.O_RDONLY)
+        # Collectors run concurrently; keep whichever descriptor was stored first
+        fd = _proc_fds.setdefault(path, new_fd)
+        if fd != new_fd:
+            os.close(new_fd)
+    
+    # pread from offset 0 regenerates the file contents without an open/close pair
+    try:
+        data = os.pread(fd, size, 0)
+        # seq_file tables (/proc/net/tcp, mounts, diskstats...) return about a page
+        # per read whatever the buffer size, so a short read is not EOF; only an
+        # empty one is
+        while data:
+            chunk = os.pread(fd, size, len(data))
+            if not chunk:
+                break
+            data += chunk
+    except OSError:
+        # The device behind a sysfs file can go away; drop the descriptor so
+        # the next call reopens the path instead of failing forever
+        if _proc_fds.pop(path, None) is not None:
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+        raise
+    return data
+
+def _stat_field(data, key):
+    """First number on the `key` line of /proc/stat-style data, or None if absent"""
+    # Jump straight to the line instead of splitting the per-CPU and per-IRQ bulk
+    start = data.find(b'\n' + key + b' ')
+    if start < 0:
+        return None
+    start += len(key) + 2
+    return int(data[start:start + 32].split(None, 1)[0])
+
+class WorkerPool:
+    """Persistent worker threads that run batches of callables without Future objects"""
+    __slots__ = ('jobs', 'threads')
+    
+    def __init__(self, workers):
+        self.jobs = queue.SimpleQueue()
+        self.threads = [
+            threading.Thread(target=self._worker_loop, name=f'collector-{i}', daemon=True)
+            for i in range(workers)
+        ]
+        for thread in self.threads:
+            thread.start()
+    
+    def _worker_loop(self):
+        """Run jobs until a None sentinel arrives"""
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                return
+            func, results, index, done = job
+            try:
+                results[index] = (True, func())
+            except Exception as e:
+                results[index] = (False, e)
+            done.release()
+    
+    def run_all(self, funcs, timeout=None):
+        """Run callables concurrently and return (ok, result or exception) per callable.
+        
+        Entries for callables still running when the timeout expires are None.
+        """
+        results = [None] * len(funcs)
+        done = threading.Semaphore(0)
+        for index, func in enumerate(funcs):
+            self.jobs.put((func, results, index, done))
+        
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for _ in funcs:
+            remaining = None if deadline is None else max(0, deadline - time.monotonic())
+            if not done.acquire(timeout=remaining):
+                break
+        return results
+    
+    def shutdown(self, wait=True):
+        """Stop the worker threads"""
+        for _ in self.threads:
+            self.jobs.put(None)
+        if wait:
+            for thread in self.threads:
+                thread.join()
+
+class IpmiShell:
+    """Long-lived `ipmitool shell` session, so the BMC session is set up once, not per query"""
+    __slots__ = ('proc', 'supported')
+    
+    def __init__(self):
+        self.proc = None
+        # Cleared when ipmitool exits before its first prompt (built without readline)
+        self.supported = True
+    
+    def query(self, command, timeout=10):
+        """Run a shell command and return its output, or None if the shell is unavailable.
+        
+        On any failure the session is killed and reaped before the exception
+        propagates; the next query starts a new one.
+        """
+        if not self.supported:
+            return None
+        if self.proc is None and not self._start(timeout):
+            return None
+        try:
+            self.proc.stdin.write(command.encode() + b'\n')
+            return self._read_reply(timeout).decode(errors='replace')
+        except BaseException:
+            self.close()
+            raise
+    
+    def _start(self, timeout):
+        """Start the shell and wait for its first prompt"""
+        # A dumb terminal keeps readline from wrapping the prompt in escape sequences
+        self.proc = subprocess.Popen(['ipmitool', 'shell'], stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                     stderr=subprocess.DEVNULL, bufsize=0,
+                                     env={**_RUN_KW['env'], 'TERM': 'dumb'})
+        try:
+            self._read_reply(timeout)
+            return True
+        except TimeoutError:
+            self.close()
+            raise
+        except OSError as e:
+            # Exited without a prompt: this ipmitool has no shell
+            self.close()
+            logger.info("ipmitool shell unavailable, running ipmitool per query: %s", e)
+            self.supported = False
+            return False
+        except BaseException:
+            self.close()
+            raise
+    
+    def _read_reply(self, timeout):
+        """Read output up to the next prompt"""
+        fd = self.proc.stdout.fileno()
+        deadline = time.monotonic() + timeout
+        output = bytearray()
+        while not output.endswith(IPMI_SHELL_PROMPT):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not select.select([fd], [], [], remaining)[0]:
+                raise TimeoutError(f"no ipmitool prompt within {timeout}s")
+            chunk = os.read(fd, 65536)
+            if not chunk:
+                raise OSError("ipmitool shell exited")
+            output += chunk
+        return output[:-len(IPMI_SHELL_PROMPT)]
+    
+    def close(self):
+        """End the session"""
+        if self.proc is None:
+            return
+        proc, self.proc = self.proc, None
+        proc.kill()
+        proc.wait()
+        proc.stdin.close()
+        proc.stdout.close()
+
+class NvidiaSmiStream:
+    """Long-lived `nvidia-smi --loop-ms` query whose latest row per GPU is kept in memory"""
+    __slots__ = ('command', 'interval', 'proc', 'started', 'rows', 'first_row')
+    
+    # Rows older than this many loop intervals are stale; when no GPU has
+    # reported for that long nvidia-smi is considered hung and restarted
+    STALE_INTERVALS = 3
+    
+    def __init__(self, command, interval):
+        self.command = command
+        self.interval = interval
+        self.proc = None
+        self.started = 0.0
+        # (arrival time, CSV values) per GPU index, replaced as nvidia-smi prints each sample
+        self.rows = {}
+        self.first_row = threading.Event()
+    
+    def latest(self, timeout=5):
+        """Fresh CSV values per GPU, restarting nvidia-smi if it has exited or stalled"""
+        if self.proc is None or self.proc.poll() is not None:
+            self._start()
+        elif time.monotonic() - max((arrived for arrived, _ in list(self.rows.values())),
+                                    default=self.started) > self.STALE_INTERVALS * self.interval:
+            logger.warning("nvidia-smi stopped reporting; restarting it")
+            self.close()
+            self._start()
+        # Only the first call after a start waits, for the first sample
+        self.first_row.wait(timeout)
+        oldest = time.monotonic() - self.STALE_INTERVALS * self.interval
+        return [values for arrived, values in list(self.rows.values()) if arrived >= oldest]
+    
+    def _start(self):
+        """Start nvidia-smi and a thread reading its samples"""
+        # Fresh containers per run, so a reader still draining a killed
+        # process cannot write into the new one's
+        self.rows = {}
+        self.first_row = threading.Event()
+        self.started = time.monotonic()
+        self.proc = subprocess.Popen(self.command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                     text=True, env=_RUN_KW['env'])
+        threading.Thread(target=self._read_rows, args=(self.proc, self.rows, self.first_row),
+                         name='nvidia-smi', daemon=True).start()
+    
+    @staticmethod
+    def _read_rows(proc, rows, first_row):
+        """Store each sample row with its arrival time until nvidia-smi exits"""
+        with proc.stdout:
+            for line in proc.stdout:
+                values = [value.strip() for value in line.split(',')]
+                rows[values[0]] = (time.monotonic(), values)
+                first_row.set()
+    
+    def close(self):
+        """Stop nvidia-smi"""
+        if self.proc is not None:
+            self.proc.kill()
+            self.proc.wait()
+            self.proc = None
+
+class SnapshotCollector:
+    """Registry collector exposing the metric families built by the last collection"""
+    __slots__ = ('families',)
+    
+    def __init__(self):
+        self.families = []
+    
+    def update(self, families):
+        """Atomically replace the exposed families"""
+        self.families = list(families)
+    
+    def collect(self):
+        """Yield the families from the last collection"""
+        return iter(self.families)
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """HTTP connection to a daemon API listening on a unix socket"""
+    
+    def __init__(self, socket_path, timeout=5):
+        super().__init__('localhost', timeout=timeout)
+        self.socket_path = socket_path
+    
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+def _unix_get_json(socket_path, path, timeout=5):
+    """GET a JSON document from a unix-socket HTTP API"""
+    conn = UnixHTTPConnection(socket_path, timeout)
+    try:
+        conn.request('GET', path)
+        response = conn.getresponse()
+        body = response.read()
+        if response.status != 200:
+            raise OSError(f"GET {path} returned HTTP {response.status}")
+        return json_loads(body)
+    finally:
+        conn.close()
+
+def start_snapshot_server(port, exporter):
+    """Serve the exporter's last rendered exposition from a background HTTP server"""
+    class SnapshotHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = exporter.scrape()
+            compress = 'gzip' in self.headers.get('Accept-Encoding', '')
+            if compress:
+                body = exporter.compressed(body)
+            self.send_response(200)
+            self.send_header('Content-Type', CONTENT_TYPE_LATEST)
+            if compress:
+                self.send_header('Content-Encoding', 'gzip')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        
+        def log_message(self, format, *args):
+            pass  # scrapes would otherwise flood stderr
+    
+    server = ThreadingHTTPServer(('0.0.0.0', port), SnapshotHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='http', daemon=True).start()
+    return server
+
+@lru_cache(maxsize=1)
+def _parse_mdstat(content):
+    """Parse /proc/mdstat into (arrays, syncs).
+    
+    arrays holds (name, state, total_disks, active_disks) per array and syncs maps
+    an array name to its (percent, speed_kb) resync progress, either may be None.
+    Cached on the raw bytes, so an unchanged mdstat is not parsed again.
+    """
+    arrays = []
+    syncs = {}
+    current_array = None
+    for line in content.split(b'\n'):
+        # Array definition line
+        if line.startswith(b'md'):
+            parts = line.split()
+            if len(parts) >= 4:
+                current_array = parts[0].decode()
+                
+                # Count disks
+                total_disks = 0
+                active_disks = 0
+                
+                # Parse disk configuration
+                for part in parts[3:]:
+                    if b'[' in part and b']' in part:
+                        # Format: sda1[0] or sda1[0](F) for failed
+                        total_disks += 1
+                        if b'(F)' not in part:
+                            active_disks += 1
+                
+                arrays.append((current_array, parts[2].decode(), total_disks, active_disks))
+        
+        # Sync status line
+        elif current_array and (b'recovery' in line or b'resync' in line or b'reshape' in line):
+            percent = _RE_MD_SYNC_PERCENT.search(line)
+            speed = _RE_MD_SYNC_SPEED.search(line)
+            syncs[current_array] = (float(percent.group(1)) if percent else None,
+                                    int(speed.group(1)) if speed else None)
+    return arrays, syncs
+
+@lru_cache(maxsize=1)
+def _parse_mounts(mounts, filesystems):
+    """(device, mountpoint, fstype, readonly) per device-backed mount in /proc/mounts data.
+    
+    Matches psutil.disk_partitions(all=False): only filesystem types that
+    /proc/filesystems does not mark nodev (plus zfs) are kept. Cached on the
+    raw bytes, so unchanged mount tables are not parsed again.
+    """
+    fstypes = {b'zfs'}
+    for line in filesystems.split(b'\n'):
+        if line and not line.startswith(b'nodev'):
+            fstypes.add(line.strip())
+    
+    partitions = []
+    for line in mounts.split(b'\n'):
+        fields = line.split()
+        if len(fields) < 4 or fields[2] not in fstypes or fields[0] == b'none':
+            continue
+        # Spaces and other specials in paths are octal-escaped (\040)
+        device, mountpoint = (
+            _RE_MOUNT_ESCAPE.sub(lambda m: chr(int(m.group(1), 8)), field.decode(errors='replace'))
+            for field in fields[:2]
+        )
+        partitions.append((device, mountpoint, fields[2].decode(), int(b'ro' in fields[3].split(b','))))
+    return partitions
+
+@lru_cache(maxsize=1)
+def _path_executables():
+    """Map each file name on $PATH to its first location; PATH does not change while the exporter runs"""
+    # One directory listing per PATH entry replaces a stat per entry for every tool probed
+    found = {}
+    for directory in os.environ.get('PATH', os.defpath).split(os.pathsep):
+        try:
+            with os.scandir(directory or '.') as entries:
+                for entry in entries:
+                    if entry.name not in found and entry.is_file():
+                        found[entry.name] = entry.path
+        except OSError:
+            pass
+    return found
+
+def _nvml_query(func, *args):
+    """Result of an NVML device query, or None when the GPU does not support it"""
+    try:
+        return func(*args)
+    except pynvml.NVMLError:
+        return None
+
+def _parse_nvme_smart_log(log, device):
+    """Map a raw NVMe SMART / Health log page onto the smartctl JSON fields we export"""
+    def counter(offset):
+        # The log's counters are 128-bit little-endian
+        return int.from_bytes(log[offset:offset + 16], 'little')
+    
+    # Model and serial are controller attributes in sysfs (nvme0n1 -> nvme0)
+    controller = f'/sys/block/{device}/device'
+    try:
+        model = _read_small(f'{controller}/model', 128).strip().decode(errors='replace')
+        serial = _read_small(f'{controller}/serial', 64).strip().decode(errors='replace')
+    except OSError:
+        model = serial = 'unknown'
+    
+    return {
+        'model_name': model,
+        'serial_number': serial,
+        # smartctl fails the health check whenever a critical warning bit is set
+        'smart_status': {'passed': log[0] == 0},
+        'temperature': {'current': int.from_bytes(log[1:3], 'little') - 273},
+        'power_cycle_count': counter(112),
+        'power_on_time': {'hours': counter(128)},
+        'nvme_smart_health_information_log': {
+            'percentage_used': log[5],
+            'media_errors': counter(160),
+        },
+    }
+
+def _scan_drm():
+    """Map PCI vendor ID (b'0x1002' and so on) to the (card, device directory) pairs of its DRM cards"""
+    cards = {}
+    try:
+        with os.scandir('/sys/class/drm') as entries:
+            # Skip connector entries such as card0-HDMI-A-1
+            card_names = sorted(entry.name for entry in entries
+                                if entry.name.startswith('card') and '-' not in entry.name)
+    except OSError:
+        return cards
+    for card in card_names:
+        device = f'/sys/class/drm/{card}/device'
+        try:
+            vendor = _read_small(f'{device}/vendor', 8).strip()
+        except OSError:
+            continue
+        cards.setdefault(vendor, []).append((card, device))
+    return cards
+
+def _fnum(value):
+    """Float from a tool's output field, or None for placeholders like [N/A] and na"""
+    # Placeholders are common (passive cards report no fan), so they are
+    # screened out before float() rather than through a raised ValueError
+    if not value or value[0] == '[' or value == 'na':
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+def _which(name):
+    """shutil.which answered from the cached PATH listing"""
+    path = _path_executables().get(name)
+    return path if path and os.access(path, os.X_OK) else None
+
+def collector(name):
+    """Decorator recording a collector's duration, success and errors under `name`.
+    
+    The wrapped call returns whether the collector succeeded.
+    """
     def decorator(func):
         @wraps(func)
-        def wrapper(*args, **kwargs):
+        def wrapper(self, *args):
+            children = self.collector_children.get(name)
+            if children is None:
+                children = self.collector_children[name] = (
+                    self.collection_duration.labels(collector=name),
+                    self.collection_success.labels(collector=name),
+                    self.collection_errors.labels(collector=name),
+                )
+            duration, success, errors = children
+            
+            # Timed by hand rather than with .time(), which builds a Timer per call
+            start = time.perf_counter()
             try:
-                return func(*args, **kwargs)
-            except subprocess.TimeoutExpired:
-                logger.warning(f"{func.__name__} timed out after {timeout}s")
-                return None
+                func(self, *args)
+                success.set(1)
+                return True
             except Exception as e:
-                logger.error(f"Error in {func.__name__}: {e}")
-                return None
+                logger.error("Error collecting %s metrics: %s", name, e)
+                errors.inc()
+                success.set(0)
+                return False
+            finally:
+                duration.observe(time.perf_counter() - start)
         return wrapper
     return decorator
 
 class EnhancedProxmoxExporter:
+    # Metric attribute slots are derived from the tables above; every other
+    # instance attribute is listed explicitly here and must be added when introduced
+    __slots__ = (
+        'registry', 'hostname', 'start_time', 'cache', 'rate_limiter', 'cpu_counts',
+        'features', 'collectors', 'executor', 'fs_collector', 'disk_collector', 'net_collector',
+        'throttle_collector', 'kernel_collector', 'container_collector', 'vm_collector', 'zfs_collector', 'guest_configs',
+        'statvfs_cache', 'statvfs_pending', 'smart_collector', 'smart_pool', 'ipmi_states', 'container_pool',
+        'sensor_cells', 'gpu_cells', 'nvml_handles', 'nvidia_smi', 'ipmi_shell',
+        'systemd_collector', 'systemd_bus',
+        'proc_ticks', 'proc_scan_time', 'top_processes', 'cpu_handles', 'cpu_totals', 'boot_timestamp', 'exposition', 'exposition_gzip',
+        'collect_lock', 'collected_at', 'last_scrape', 'collector_due', 'collector_children', 'collectors_running',
+    ) + tuple(dict.fromkeys(
+        entry[0]
+        for table in (BASE_METRICS, ADVANCED_METRICS, TEMPERATURE_METRICS, GPU_METRICS,
+                      ZFS_METRICS, VM_METRICS, CONTAINER_METRICS, SMART_METRICS, IPMI_METRICS,
+                      SYSTEMD_METRICS, MDADM_METRICS, UPS_METRICS, BTRFS_METRICS, EXPORTER_METRICS)
+        for entry in table
+    ))
+    
     def __init__(self):
         self.registry = CollectorRegistry()
         self.hostname = socket.gethostname()
@@ -124,6 +1129,54 @@ class EnhancedProxmoxExporter:
         self.cache = MetricCache()
         self.rate_limiter = RateLimiter()
         
+        # Text exposition rendered after each collection cycle; scrapes are
+        # answered from it and never touch the registry
+        self.exposition = b''
+        # (exposition, gzip of it), compressed on the first gzip scrape of each cycle
+        self.exposition_gzip = (b'', gzip.compress(b''))
+        # Serializes collection cycles between the loop and on-demand scrapes
+        self.collect_lock = threading.Lock()
+        # Monotonic times of the last completed collection and the last scrape;
+        # startup counts as a scrape so the loop starts out collecting
+        self.collected_at = 0.0
+        self.last_scrape = time.monotonic()
+        # Monotonic time each collector in COLLECTOR_INTERVALS next runs
+        self.collector_due = {}
+        # Collectors submitted to the pool that have not returned yet, including
+        # ones a cycle stopped waiting for
+        self.collectors_running = set()
+        # (duration, success, errors) children per decorated collector, resolved on first run
+        self.collector_children = {}
+        
+        # Last statvfs result per remote mount, and mounts with a probe still running
+        self.statvfs_cache = {}
+        self.statvfs_pending = set()
+        
+        # Threads for parallel smartctl calls, started with the SMART metrics
+        self.smart_pool = None
+        # System bus connection for systemd queries, opened on first use
+        self.systemd_bus = None
+        # Threads for parallel per-container stats requests, started with the container metrics
+        self.container_pool = None
+        # (handle, index, name) per NVIDIA GPU, or None while NVML is not initialized
+        self.nvml_handles = None
+        # Persistent nvidia-smi query, used when NVML is unavailable
+        self.nvidia_smi = None
+        # Gauge children per (metric attribute, type label, GPU labels), see _gpu_cell
+        self.gpu_cells = {}
+        # Persistent ipmitool session, started with the IPMI metrics
+        self.ipmi_shell = None
+        # (mtime, name, memory bytes) per guest config path, re-read when the file changes
+        self.guest_configs = {}
+        # Current state label per IPMI sensor, so a state change replaces the old series
+        self.ipmi_states = {}
+        # Gauge children per psutil (chip, label) temperature sensor, resolved the
+        # first time the sensor is seen; only used on hosts without hwmon temperatures
+        self.sensor_cells = {}
+        
+        # Last published CPU counts (see _count_cpus)
+        self.cpu_counts = {}
+        
         # Feature detection flags
         self.features = {
             'sensors': False,
@@ -150,11 +1203,19 @@ class EnhancedProxmoxExporter:
         # Collectors
         self.collectors = {}
         
-        # Thread pool for parallel collection
-        if PARALLEL_COLLECTORS:
-            self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=MAX_WORKERS)
-        else:
-            self.executor = None
+        # CPU ticks per process from the previous scan, for per-process CPU usage
+        self.proc_ticks = {}
+        self.proc_scan_time = time.monotonic()
+        # (rank, name, pid) label sets currently exported per top-process ranking
+        self.top_processes = {'cpu': [], 'memory': []}
+        
+        # Per-CPU metric children, bound on first use (see _cpu_handles)
+        self.cpu_handles = []
+        # Per-CPU (total, idle) ticks from the previous scrape, for usage percent
+        self.cpu_totals = []
+        
+        # Thread pool for parallel collection, started once the collectors are known
+        self.executor = None
         
         # Detect available features
         self._detect_features()
@@ -162,20 +1223,34 @@ class EnhancedProxmoxExporter:
         # Initialize metrics based on detected features
         self._init_all_metrics()
         
-        logger.info(f"Enhanced Exporter initialized with features: {[k for k,v in self.features.items() if v]}")
+        # Features are fixed after detection, so pick the collectors once
+        self._init_collectors()
+        if PARALLEL_COLLECTORS:
+            # Collectors mostly wait on subprocesses and sockets; with a worker
+            # each, a cycle takes as long as the slowest one rather than a sum
+            self.executor = WorkerPool(MAX_WORKERS or len(self.collectors))
+        
+        # Host identity does not change while the exporter runs
+        self.boot_timestamp = psutil.boot_time()
+        self._set_static_info()
+        
+        logger.info("Enhanced Exporter initialized with features: %s", [k for k,v in self.features.items() if v])
     
     def _detect_features(self):
         """Detect available system features with parallel detection"""
+        cached = self._load_cached_features()
+        if cached is not None:
+            logger.info("Using features detected at last start (%s)", FEATURE_CACHE_FILE)
+            self.features.update(cached)
+            return
+        
         logger.info("Detecting system features...")
         
         detection_tasks = [
             ('sensors', self._detect_sensors),
             ('zfs', self._detect_zfs),
-            ('nvidia_gpu', self._detect_nvidia_gpu),
-            ('amd_gpu', self._detect_amd_gpu),
-            ('intel_gpu', self._detect_intel_gpu),
-            ('qemu_vms', self._detect_qemu),
-            ('lxc_containers', self._detect_lxc),
+            ('gpus', self._detect_gpus),
+            ('pve', self._detect_pve),
             ('docker', self._detect_docker),
             ('podman', self._detect_podman),
             ('smart_monitoring', self._detect_smart),
@@ -190,157 +1265,253 @@ class EnhancedProxmoxExporter:
             ('btrfs', self._detect_btrfs),
         ]
         
-        for feature, detect_func in detection_tasks:
-            try:
-                if detect_func():
-                    self.features[feature] = True
-                    logger.info(f"✓ {feature.replace('_', ' ').title()} detected")
-            except Exception as e:
-                logger.debug(f"Failed to detect {feature}: {e}")
+        # Probes are I/O bound (PATH lookups, sysfs reads, a few subprocesses),
+        # so run them concurrently and only wait as long as the slowest one.
+        # A tool that hangs (ipmitool on a half-configured BMC, say) must not
+        # hold up startup, so the whole batch shares one deadline
+        executor = WorkerPool(MAX_WORKERS or len(detection_tasks))
+        timed_out = False
+        try:
+            results = executor.run_all([detect_func for _, detect_func in detection_tasks], timeout=DETECTION_TIMEOUT)
+            for (feature, _), result in zip(detection_tasks, results):
+                if result is None:
+                    logger.warning("Detecting %s took over %ss; treating it as absent", feature, DETECTION_TIMEOUT)
+                    timed_out = True
+                    continue
+                ok, detected = result
+                if not ok:
+                    logger.debug("Failed to detect %s: %s", feature, detected)
+                    continue
+                # Some probes cover several features at once and return a dict
+                if not isinstance(detected, dict):
+                    detected = {feature: detected}
+                for name, present in detected.items():
+                    if present:
+                        self.features[name] = True
+                        logger.info("✓ %s detected", name.replace('_', ' ').title())
+        finally:
+            executor.shutdown(wait=not timed_out)
+        
+        # An incomplete detection is not worth reusing on the next start
+        if not timed_out:
+            self._save_cached_features()
+    
+    def _feature_cache_key(self):
+        """Host identity the cached features are valid for"""
+        # A new kernel can bring new drivers (hwmon, GPUs), so it invalidates the cache
+        return f'{platform.node()} {platform.release()}'
+    
+    def _load_cached_features(self):
+        """Features saved by a recent start on this host, or None"""
+        if not FEATURE_CACHE_TTL:
+            return None
+        try:
+            if time.time() - os.path.getmtime(FEATURE_CACHE_FILE) > FEATURE_CACHE_TTL:
+                return None
+            with open(FEATURE_CACHE_FILE) as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if cached.get('host') != self._feature_cache_key():
+            return None
+        # Only accept known feature names, so an old cache can't add unknown ones
+        return {name: bool(present) for name, present in cached.get('features', {}).items()
+                if name in self.features}
+    
+    def _save_cached_features(self):
+        """Save detected features for the next start; failures only cost a re-detection"""
+        if not FEATURE_CACHE_TTL:
+            return
+        try:
+            os.makedirs(os.path.dirname(FEATURE_CACHE_FILE), exist_ok=True)
+            tmp_path = f'{FEATURE_CACHE_FILE}.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump({'host': self._feature_cache_key(), 'features': self.features}, f)
+            os.replace(tmp_path, FEATURE_CACHE_FILE)
+        except OSError as e:
+            logger.debug("Could not save feature cache: %s", e)
     
     def _detect_sensors(self):
         """Detect temperature sensors"""
-        if shutil.which('sensors'):
-            result = subprocess.run(['sensors'], capture_output=True, text=True, timeout=2)
-            return result.returncode == 0 and len(result.stdout) > 10
-        return False
+        return _which('sensors') is not None
     
     def _detect_zfs(self):
         """Detect ZFS"""
-        return os.path.exists('/proc/spl/kstat/zfs') or shutil.which('zpool')
+        return os.path.exists('/proc/spl/kstat/zfs') or _which('zpool')
     
-    def _detect_nvidia_gpu(self):
-        """Detect NVIDIA GPU"""
-        if shutil.which('nvidia-smi'):
-            result = subprocess.run(['nvidia-smi', '-L'], capture_output=True, text=True, timeout=2)
-            return result.returncode == 0 and 'GPU' in result.stdout
-        return False
-    
-    def _detect_amd_gpu(self):
-        """Detect AMD GPU"""
-        # Check via vendor ID in sysfs
-        amd_cards = glob.glob('/sys/class/drm/card*/device/vendor')
-        for vendor_file in amd_cards:
+    def _detect_gpus(self):
+        """Detect AMD and Intel GPUs in a single pass over DRM cards, NVIDIA ones through NVML or nvidia-smi"""
+        # The card scan is shared with AMD GPU discovery
+        cards = self.cache.get('drm_cards', _scan_drm, ttl=600)
+        found = {
+            # A 0x10de card may be driven by nouveau, which neither NVML nor
+            # nvidia-smi can query; the metrics need the proprietary driver
+            'nvidia_gpu': self._nvml_usable(),
+            'amd_gpu': b'0x1002' in cards,  # AMD vendor ID
+            'intel_gpu': False,
+        }
+        # Intel vendor ID; only Arc/Xe graphics count, not integrated ones
+        for _, device in cards.get(b'0x8086', ()):
             try:
-                with open(vendor_file, 'r') as f:
-                    if f.read().strip() == '0x1002':  # AMD vendor ID
-                        return True
-            except:
+                # Intel Arc/Xe device IDs typically start with 0x56 or 0x4c
+                if _read_small(f'{device}/device', 8).startswith((b'0x56', b'0x4c')):
+                    found['intel_gpu'] = True
+            except OSError:
                 pass
         
-        # Check rocm-smi
-        if shutil.which('rocm-smi'):
-            result = subprocess.run(['rocm-smi', '--showid'], capture_output=True, text=True, timeout=2)
-            return result.returncode == 0
+        # Vendor tools may be present even when sysfs is not exposed; without
+        # NVML, nvidia-smi is also what the NVIDIA metrics are read from
+        if not found['nvidia_gpu']:
+            if STRICT_DETECTION:
+                found['nvidia_gpu'] = self._probe_command(['nvidia-smi', '-L'])
+            else:
+                found['nvidia_gpu'] = _which('nvidia-smi') is not None
+        if not found['amd_gpu']:
+            if STRICT_DETECTION:
+                found['amd_gpu'] = self._probe_command(['rocm-smi', '--showid'])
+            else:
+                found['amd_gpu'] = _which('rocm-smi') is not None
         
-        return False
+        return found
     
-    def _detect_intel_gpu(self):
-        """Detect Intel GPU"""
-        intel_cards = glob.glob('/sys/class/drm/card*/device/vendor')
-        for vendor_file in intel_cards:
-            try:
-                with open(vendor_file, 'r') as f:
-                    if f.read().strip() == '0x8086':  # Intel vendor ID
-                        card_dir = os.path.dirname(vendor_file)
-                        # Check for Arc/Xe graphics (not just integrated)
-                        device_file = os.path.join(card_dir, 'device')
-                        if os.path.exists(device_file):
-                            with open(device_file, 'r') as df:
-                                device_id = df.read().strip()
-                                # Intel Arc/Xe device IDs typically start with 0x56 or 0x4c
-                                if device_id.startswith(('0x56', '0x4c')):
-                                    return True
-            except:
-                pass
-        return False
+    @staticmethod
+    def _nvml_usable():
+        """Check that pynvml is installed and NVML initializes"""
+        if pynvml is None:
+            return False
+        try:
+            pynvml.nvmlInit()
+        except pynvml.NVMLError:
+            return False
+        pynvml.nvmlShutdown()
+        return True
     
-    def _detect_qemu(self):
-        """Detect QEMU VMs"""
-        if shutil.which('qm'):
-            result = subprocess.run(['qm', 'list'], capture_output=True, text=True, timeout=2)
-            return result.returncode == 0
-        return False
+    def _probe_command(self, cmd, timeout=2):
+        """Check that a CLI tool is installed and runs successfully"""
+        if not _which(cmd[0]):
+            return False
+        result = subprocess.run(cmd, timeout=timeout, **_RUN_KW)
+        return result.returncode == 0
     
-    def _detect_lxc(self):
-        """Detect LXC containers"""
-        if shutil.which('pct'):
-            result = subprocess.run(['pct', 'list'], capture_output=True, text=True, timeout=2)
-            return result.returncode == 0
-        return False
+    def _detect_pve(self):
+        """Detect a PVE node, which provides both QEMU VMs (qm) and LXC containers (pct)"""
+        # qm and pct ship together with every PVE node, so one check covers both
+        if STRICT_DETECTION:
+            # pmxcfs writes .version once the cluster filesystem is up; a working
+            # pveversion then stands in for separate `qm list` and `pct list` runs
+            is_pve = os.path.exists('/etc/pve/.version') and self._probe_command(['pveversion'])
+        else:
+            # Every PVE node mounts /etc/pve
+            is_pve = os.path.isdir('/etc/pve')
+        return {'qemu_vms': is_pve, 'lxc_containers': is_pve}
     
     def _detect_docker(self):
         """Detect Docker"""
-        if shutil.which('docker'):
-            result = subprocess.run(['docker', 'version'], capture_output=True, text=True, timeout=2)
-            return result.returncode == 0
-        return False
+        if STRICT_DETECTION:
+            return self._probe_command(['docker', 'version'])
+        return os.path.exists('/var/run/docker.sock')
     
     def _detect_podman(self):
         """Detect Podman"""
-        if shutil.which('podman'):
-            result = subprocess.run(['podman', 'version'], capture_output=True, text=True, timeout=2)
-            return result.returncode == 0
-        return False
+        if STRICT_DETECTION:
+            return self._probe_command(['podman', 'version'])
+        # Podman is daemonless; its API socket only exists when podman.socket is enabled
+        return os.path.exists(PODMAN_SOCKET) or _which('podman') is not None
     
     def _detect_smart(self):
         """Detect SMART monitoring"""
-        return shutil.which('smartctl') is not None
+        return _which('smartctl') is not None
     
     def _detect_ipmi(self):
         """Detect IPMI"""
-        if shutil.which('ipmitool'):
-            result = subprocess.run(['ipmitool', 'sensor'], capture_output=True, text=True, timeout=5)
-            return result.returncode == 0
-        return False
+        if STRICT_DETECTION:
+            # Asks the BMC for its identity instead of reading every sensor
+            return self._probe_command(['ipmitool', 'mc', 'info'])
+        # ipmitool talks to the BMC through the kernel IPMI device node
+        return _which('ipmitool') is not None and any(
+            os.path.exists(path) for path in ('/dev/ipmi0', '/dev/ipmi/0', '/dev/ipmidev/0')
+        )
     
     def _detect_nvme(self):
         """Detect NVMe devices"""
-        return len(glob.glob('/sys/class/nvme/nvme*')) > 0
+        # Stop at the first controller instead of fnmatch-ing the whole class directory
+        try:
+            with os.scandir('/sys/class/nvme') as entries:
+                return any(entry.name.startswith('nvme') for entry in entries)
+        except OSError:
+            return False
     
     def _detect_systemd(self):
         """Detect systemd"""
-        return shutil.which('systemctl') is not None
+        return _which('systemctl') is not None
     
     def _detect_mdadm(self):
         """Detect mdadm RAID"""
         if os.path.exists('/proc/mdstat'):
-            with open('/proc/mdstat', 'r') as f:
-                content = f.read()
-                return 'md' in content
+            with open('/proc/mdstat', 'rb') as f:
+                return _RE_MD_ARRAY.search(f.read()) is not None
         return False
     
     def _detect_nfs(self):
         """Detect NFS mounts"""
         try:
-            with open('/proc/mounts', 'r') as f:
+            with open('/proc/mounts', 'rb') as f:
                 for line in f:
-                    if ':' in line and ('nfs' in line or 'nfs4' in line):
+                    if b':' in line and b'nfs' in line:
                         return True
-        except:
+        except OSError:
             pass
         return False
     
     def _detect_nut(self):
         """Detect NUT UPS monitoring"""
-        return shutil.which('upsc') is not None
+        return _which('upsc') is not None
     
     def _detect_ceph(self):
         """Detect Ceph"""
-        return shutil.which('ceph') is not None
+        return _which('ceph') is not None
     
     def _detect_glusterfs(self):
         """Detect GlusterFS"""
-        return shutil.which('gluster') is not None
+        return _which('gluster') is not None
     
     def _detect_btrfs(self):
         """Detect Btrfs filesystems"""
         try:
-            result = subprocess.run(['findmnt', '-t', 'btrfs'], capture_output=True, text=True, timeout=2)
+            result = subprocess.run(['findmnt', '-t', 'btrfs'], timeout=2, **_RUN_KW)
             return result.returncode == 0 and len(result.stdout.strip()) > 0
-        except:
+        except (OSError, subprocess.SubprocessError):
             return False
     
+    def _init_collectors(self):
+        """Select the collectors to run for the detected features"""
+        self.collectors = {'base': self.collect_base_metrics}
+        
+        # Add conditional collectors
+        if self.features['sensors']:
+            self.collectors['temperature'] = self.collect_temperature_metrics
+        if self.features['systemd']:
+            self.collectors['systemd'] = self.collect_systemd_metrics
+        if self.features['mdadm']:
+            self.collectors['mdadm'] = self.collect_mdadm_metrics
+        if self.features['docker'] or self.features['podman']:
+            self.collectors['containers'] = self.collect_container_metrics
+        if self.features['smart_monitoring']:
+            self.collectors['smart'] = self.collect_smart_metrics
+        if self.features['ipmi']:
+            self.collectors['ipmi'] = self.collect_ipmi_metrics
+        if self.features['qemu_vms'] or self.features['lxc_containers']:
+            self.collectors['vms'] = self.collect_vm_metrics
+        if self.features['zfs']:
+            self.collectors['zfs'] = self.collect_zfs_metrics
+        if self.features['nvidia_gpu'] or self.features['amd_gpu']:
+            self.collectors['gpu'] = self.collect_gpu_metrics
+    
+    def _register_metrics(self, table):
+        """Create metrics from an (attribute, type, name, description, labels) table"""
+        for attr, metric_cls, name, documentation, labels in table:
+            setattr(self, attr, metric_cls(name, documentation, labels or (), registry=self.registry))
+    
     def _init_all_metrics(self):
         """Initialize all metrics"""
         self._init_base_metrics()
@@ -350,7 +1521,7 @@ class EnhancedProxmoxExporter:
             self._init_temperature_metrics()
         if self.features['zfs']:
             self._init_zfs_metrics()
-        if any([self.features['nvidia_gpu'], self.features['amd_gpu'], self.features['intel_gpu']]):
+        if self.features['nvidia_gpu'] or self.features['amd_gpu'] or self.features['intel_gpu']:
             self._init_gpu_metrics()
         if self.features['qemu_vms'] or self.features['lxc_containers']:
             self._init_vm_metrics()
@@ -373,1136 +1544,1532 @@ class EnhancedProxmoxExporter:
     
     def _init_base_metrics(self):
         """Initialize base metrics that are always collected"""
-        # Node information
-        self.node_info = Info('node', 'Node information', registry=self.registry)
-        self.node_features = Info('node_features', 'Detected node features', registry=self.registry)
-        self.pve_version = Info('pve_version', 'Proxmox VE version', registry=self.registry)
-        self.boot_time = Gauge('node_boot_time_seconds', 'Node boot time', registry=self.registry)
-        self.uptime_seconds = Gauge('node_uptime_seconds', 'System uptime in seconds', registry=self.registry)
-        
-        # CPU metrics
-        self.cpu_count = Gauge('node_cpu_count', 'Number of CPUs', ['type'], registry=self.registry)
-        self.cpu_usage = Gauge('node_cpu_seconds_total', 'CPU time spent',
-                              ['cpu', 'mode'], registry=self.registry)
-        self.cpu_percent = Gauge('node_cpu_usage_percent', 'CPU usage percentage',
-                                ['cpu'], registry=self.registry)
-        self.cpu_frequency = Gauge('node_cpu_frequency_hertz', 'CPU frequency',
-                                  ['cpu', 'type'], registry=self.registry)
-        self.cpu_throttles = Counter('node_cpu_throttles_total', 'CPU throttling events',
-                                    ['cpu', 'type'], registry=self.registry)
-        self.load_1 = Gauge('node_load1', '1 minute load average', registry=self.registry)
-        self.load_5 = Gauge('node_load5', '5 minute load average', registry=self.registry)
-        self.load_15 = Gauge('node_load15', '15 minute load average', registry=self.registry)
-        
-        # Memory metrics
-        self.memory_total = Gauge('node_memory_MemTotal_bytes', 'Total memory', registry=self.registry)
-        self.memory_free = Gauge('node_memory_MemFree_bytes', 'Free memory', registry=self.registry)
-        self.memory_available = Gauge('node_memory_MemAvailable_bytes', 'Available memory', registry=self.registry)
-        self.memory_cached = Gauge('node_memory_Cached_bytes', 'Cached memory', registry=self.registry)
-        self.memory_buffers = Gauge('node_memory_Buffers_bytes', 'Buffer memory', registry=self.registry)
-        self.memory_shared = Gauge('node_memory_Shared_bytes', 'Shared memory', registry=self.registry)
-        self.memory_slab = Gauge('node_memory_Slab_bytes', 'Slab memory', registry=self.registry)
-        self.memory_pressure_ratio = Gauge('node_memory_pressure_ratio', 'Memory pressure ratio', registry=self.registry)
-        self.swap_total = Gauge('node_memory_SwapTotal_bytes', 'Total swap', registry=self.registry)
-        self.swap_free = Gauge('node_memory_SwapFree_bytes', 'Free swap', registry=self.registry)
-        self.swap_used_percent = Gauge('node_memory_swap_used_percent', 'Swap usage percentage', registry=self.registry)
-        
-        # Disk metrics
-        self.fs_size = Gauge('node_filesystem_size_bytes', 'Filesystem size',
-                            ['device', 'mountpoint', 'fstype'], registry=self.registry)
-        self.fs_free = Gauge('node_filesystem_free_bytes', 'Filesystem free',
-                            ['device', 'mountpoint', 'fstype'], registry=self.registry)
-        self.fs_avail = Gauge('node_filesystem_avail_bytes', 'Filesystem available',
-                             ['device', 'mountpoint', 'fstype'], registry=self.registry)
-        self.fs_files = Gauge('node_filesystem_files', 'Total file nodes',
-                             ['device', 'mountpoint', 'fstype'], registry=self.registry)
-        self.fs_files_free = Gauge('node_filesystem_files_free', 'Free file nodes',
-                                  ['device', 'mountpoint', 'fstype'], registry=self.registry)
-        self.fs_readonly = Gauge('node_filesystem_readonly', 'Filesystem is read-only',
-                                ['device', 'mountpoint', 'fstype'], registry=self.registry)
-        
-        self.disk_read_bytes = Counter('node_disk_read_bytes_total', 'Disk bytes read',
-                                      ['device'], registry=self.registry)
-        self.disk_written_bytes = Counter('node_disk_written_bytes_total', 'Disk bytes written',
-                                         ['device'], registry=self.registry)
-        self.disk_reads_completed = Counter('node_disk_reads_completed_total', 'Disk reads completed',
-                                           ['device'], registry=self.registry)
-        self.disk_writes_completed = Counter('node_disk_writes_completed_total', 'Disk writes completed',
-                                            ['device'], registry=self.registry)
-        self.disk_read_time = Counter('node_disk_read_time_seconds_total', 'Time spent reading',
-                                     ['device'], registry=self.registry)
-        self.disk_write_time = Counter('node_disk_write_time_seconds_total', 'Time spent writing',
-                                      ['device'], registry=self.registry)
-        self.disk_io_time = Counter('node_disk_io_time_seconds_total', 'Disk I/O time',
-                                   ['device'], registry=self.registry)
-        self.disk_io_now = Gauge('node_disk_io_now', 'Number of I/Os in progress',
-                                ['device'], registry=self.registry)
-        self.disk_utilization = Gauge('node_disk_utilization', 'Disk utilization percentage',
-                                     ['device'], registry=self.registry)
+        self._register_metrics(BASE_METRICS)
         
-        # Network metrics
-        self.net_bytes_recv = Counter('node_network_receive_bytes_total', 'Network bytes received',
-                                     ['device'], registry=self.registry)
-        self.net_bytes_sent = Counter('node_network_transmit_bytes_total', 'Network bytes sent',
-                                     ['device'], registry=self.registry)
-        self.net_packets_recv = Counter('node_network_receive_packets_total', 'Network packets received',
-                                       ['device'], registry=self.registry)
-        self.net_packets_sent = Counter('node_network_transmit_packets_total', 'Network packets sent',
-                                       ['device'], registry=self.registry)
-        self.net_errs_recv = Counter('node_network_receive_errs_total', 'Network receive errors',
-                                    ['device'], registry=self.registry)
-        self.net_errs_sent = Counter('node_network_transmit_errs_total', 'Network transmit errors',
-                                    ['device'], registry=self.registry)
-        self.net_drop_recv = Counter('node_network_receive_drop_total', 'Network receive drops',
-                                    ['device'], registry=self.registry)
-        self.net_drop_sent = Counter('node_network_transmit_drop_total', 'Network transmit drops',
-                                    ['device'], registry=self.registry)
-        self.net_speed = Gauge('node_network_speed_bytes', 'Network interface speed',
-                              ['device'], registry=self.registry)
-        self.net_mtu = Gauge('node_network_mtu_bytes', 'Network interface MTU',
-                            ['device'], registry=self.registry)
-        self.net_up = Gauge('node_network_up', 'Network interface is up',
-                           ['device'], registry=self.registry)
-        
-        # Process metrics
-        self.processes_running = Gauge('node_procs_running', 'Running processes', registry=self.registry)
-        self.processes_blocked = Gauge('node_procs_blocked', 'Blocked processes', registry=self.registry)
-        self.processes_total = Gauge('node_procs_total', 'Total processes', registry=self.registry)
-        self.threads_total = Gauge('node_threads_total', 'Total threads', registry=self.registry)
-        self.forks_total = Counter('node_forks_total', 'Total forks since boot', registry=self.registry)
+        # Per-device filesystem, disk and network metrics are rebuilt as whole
+        # families each collection and handed to the registry in one piece
+        self.fs_collector = SnapshotCollector()
+        self.disk_collector = SnapshotCollector()
+        self.net_collector = SnapshotCollector()
+        self.throttle_collector = SnapshotCollector()
+        for collector in (self.fs_collector, self.disk_collector, self.net_collector, self.throttle_collector):
+            self.registry.register(collector)
     
     def _init_advanced_metrics(self):
         """Initialize advanced system metrics"""
-        # TCP/UDP connection metrics
-        self.tcp_connections = Gauge('node_network_tcp_connections', 'TCP connections by state',
-                                    ['state'], registry=self.registry)
-        self.udp_connections = Gauge('node_network_udp_connections', 'UDP connections',
-                                    ['state'], registry=self.registry)
-        
-        # Context switches and interrupts
-        self.context_switches = Counter('node_context_switches_total', 'Total context switches', 
-                                       registry=self.registry)
-        self.interrupts = Counter('node_intr_total', 'Total interrupts',
-                                 registry=self.registry)
-        
-        # File descriptors
-        self.fd_allocated = Gauge('node_filefd_allocated', 'Allocated file descriptors',
-                                 registry=self.registry)
-        self.fd_maximum = Gauge('node_filefd_maximum', 'Maximum file descriptors',
-                               registry=self.registry)
-        
-        # Page faults
-        self.vmstat_pgfault = Counter('node_vmstat_pgfault', 'Page faults',
-                                     registry=self.registry)
-        self.vmstat_pgmajfault = Counter('node_vmstat_pgmajfault', 'Major page faults',
-                                        registry=self.registry)
-        self.vmstat_pswpin = Counter('node_vmstat_pswpin', 'Pages swapped in',
-                                    registry=self.registry)
-        self.vmstat_pswpout = Counter('node_vmstat_pswpout', 'Pages swapped out',
-                                     registry=self.registry)
-        
-        # Entropy
-        self.entropy_available = Gauge('node_entropy_available_bits', 'Available entropy',
-                                      registry=self.registry)
-        
-        # Time metrics
-        self.time_seconds = Gauge('node_time_seconds', 'System time', registry=self.registry)
-        self.time_zone_offset = Gauge('node_time_zone_offset_seconds', 'Time zone offset',
-                                     registry=self.registry)
-        
-        # Kernel metrics
-        self.kernel_version = Info('node_kernel_version', 'Kernel version info', registry=self.registry)
+        self._register_metrics(ADVANCED_METRICS)
         
-        # Top processes
-        self.top_cpu_processes = Info('node_top_cpu_processes', 'Top CPU consuming processes',
-                                     registry=self.registry)
-        self.top_mem_processes = Info('node_top_memory_processes', 'Top memory consuming processes',
-                                     registry=self.registry)
+        # Kernel counters are exposed as counter families rather than by
+        # overwriting Counter internals
+        self.kernel_collector = SnapshotCollector()
+        self.registry.register(self.kernel_collector)
     
     def _init_temperature_metrics(self):
         """Initialize temperature sensor metrics"""
-        self.temp_celsius = Gauge('node_hwmon_temp_celsius', 'Temperature in Celsius',
-                                 ['chip', 'sensor', 'label'], registry=self.registry)
-        self.temp_max = Gauge('node_hwmon_temp_max_celsius', 'Maximum temperature',
-                             ['chip', 'sensor', 'label'], registry=self.registry)
-        self.temp_crit = Gauge('node_hwmon_temp_crit_celsius', 'Critical temperature',
-                              ['chip', 'sensor', 'label'], registry=self.registry)
-        self.temp_alarm = Gauge('node_hwmon_temp_alarm', 'Temperature alarm',
-                               ['chip', 'sensor', 'label'], registry=self.registry)
-        self.fan_rpm = Gauge('node_hwmon_fan_rpm', 'Fan speed RPM',
-                            ['chip', 'sensor'], registry=self.registry)
-        self.fan_min = Gauge('node_hwmon_fan_min_rpm', 'Minimum fan speed',
-                            ['chip', 'sensor'], registry=self.registry)
-        self.power_watts = Gauge('node_hwmon_power_watt', 'Power consumption',
-                                ['chip', 'sensor'], registry=self.registry)
-        self.voltage_volts = Gauge('node_hwmon_voltage_volts', 'Voltage',
-                                  ['chip', 'sensor'], registry=self.registry)
-        self.current_amps = Gauge('node_hwmon_curr_amps', 'Current',
-                                 ['chip', 'sensor'], registry=self.registry)
+        self._register_metrics(TEMPERATURE_METRICS)
     
     def _init_gpu_metrics(self):
         """Initialize GPU metrics"""
-        self.gpu_info = Info('node_gpu_info', 'GPU information', registry=self.registry)
-        self.gpu_count = Gauge('node_gpu_count', 'Number of GPUs', ['vendor'], registry=self.registry)
-        
-        # Common GPU metrics
-        self.gpu_temp = Gauge('node_gpu_temp_celsius', 'GPU temperature',
-                             ['gpu', 'name', 'vendor'], registry=self.registry)
-        self.gpu_utilization = Gauge('node_gpu_utilization_percent', 'GPU utilization',
-                                    ['gpu', 'name', 'vendor', 'type'], registry=self.registry)
-        self.gpu_memory_total = Gauge('node_gpu_memory_total_bytes', 'GPU memory total',
-                                     ['gpu', 'name', 'vendor'], registry=self.registry)
-        self.gpu_memory_used = Gauge('node_gpu_memory_used_bytes', 'GPU memory used',
-                                    ['gpu', 'name', 'vendor'], registry=self.registry)
-        self.gpu_memory_free = Gauge('node_gpu_memory_free_bytes', 'GPU memory free',
-                                    ['gpu', 'name', 'vendor'], registry=self.registry)
-        self.gpu_power_draw = Gauge('node_gpu_power_draw_watts', 'GPU power draw',
-                                   ['gpu', 'name', 'vendor'], registry=self.registry)
-        self.gpu_power_limit = Gauge('node_gpu_power_limit_watts', 'GPU power limit',
-                                    ['gpu', 'name', 'vendor'], registry=self.registry)
-        self.gpu_clock_graphics = Gauge('node_gpu_clock_graphics_hertz', 'GPU graphics clock',
-                                       ['gpu', 'name', 'vendor'], registry=self.registry)
-        self.gpu_clock_memory = Gauge('node_gpu_clock_memory_hertz', 'GPU memory clock',
-                                     ['gpu', 'name', 'vendor'], registry=self.registry)
-        self.gpu_fan_speed = Gauge('node_gpu_fan_speed_percent', 'GPU fan speed',
-                                  ['gpu', 'name', 'vendor'], registry=self.registry)
-        self.gpu_pcie_link_gen = Gauge('node_gpu_pcie_link_gen', 'PCIe link generation',
-                                       ['gpu', 'name', 'vendor'], registry=self.registry)
-        self.gpu_pcie_link_width = Gauge('node_gpu_pcie_link_width', 'PCIe link width',
-                                        ['gpu', 'name', 'vendor'], registry=self.registry)
-        self.gpu_throttle_reason = Gauge('node_gpu_throttle_reasons', 'GPU throttle reasons',
-                                        ['gpu', 'name', 'vendor', 'reason'], registry=self.registry)
+        self._register_metrics(GPU_METRICS)
+        if self.features['nvidia_gpu']:
+            self._init_nvml()
+            if self.nvml_handles is None:
+                # Every GPU and field comes from one looping query, sampled once
+                # per collection interval; the GPU count is the number of rows
+                self.nvidia_smi = NvidiaSmiStream([
+                    'nvidia-smi', '--query-gpu=index,name,' + ','.join(field for field, _, _, _ in NVIDIA_SMI_FIELDS),
+                    '--format=csv,noheader,nounits', f'--loop-ms={COLLECTION_INTERVAL * 1000}',
+                ], COLLECTION_INTERVAL)
+    
+    def _init_nvml(self):
+        """Initialize NVML once and keep a handle per NVIDIA GPU"""
+        if pynvml is None:
+            logger.info("pynvml is not installed; NVIDIA GPU metrics come from nvidia-smi")
+            return
+        try:
+            pynvml.nvmlInit()
+            handles = []
+            for index in range(pynvml.nvmlDeviceGetCount()):
+                handle = pynvml.nvmlDeviceGetHandleByIndex(index)
+                name = pynvml.nvmlDeviceGetName(handle)
+                # Older pynvml releases return bytes
+                if isinstance(name, bytes):
+                    name = name.decode()
+                handles.append((handle, str(index), name))
+            driver = pynvml.nvmlSystemGetDriverVersion()
+            self.gpu_info.info({'vendor': 'nvidia', 'driver_version': driver.decode() if isinstance(driver, bytes) else driver})
+            self.nvml_handles = handles
+        except pynvml.NVMLError as e:
+            logger.warning("NVML initialization failed, falling back to nvidia-smi: %s", e)
     
     def _init_zfs_metrics(self):
         """Initialize ZFS metrics"""
-        # ARC metrics
-        self.zfs_arc_size = Gauge('node_zfs_arc_size_bytes', 'ZFS ARC size', registry=self.registry)
-        self.zfs_arc_hits = Counter('node_zfs_arc_hits_total', 'ZFS ARC hits', registry=self.registry)
-        self.zfs_arc_misses = Counter('node_zfs_arc_misses_total', 'ZFS ARC misses', registry=self.registry)
-        self.zfs_arc_c = Gauge('node_zfs_arc_c_bytes', 'ZFS ARC target size', registry=self.registry)
-        self.zfs_arc_c_min = Gauge('node_zfs_arc_c_min_bytes', 'ZFS ARC minimum size', registry=self.registry)
-        self.zfs_arc_c_max = Gauge('node_zfs_arc_c_max_bytes', 'ZFS ARC maximum size', registry=self.registry)
-        self.zfs_arc_hit_ratio = Gauge('node_zfs_arc_hit_ratio', 'ZFS ARC hit ratio', registry=self.registry)
-        self.zfs_arc_evict_data = Counter('node_zfs_arc_evicted_bytes_total', 'ZFS ARC evicted bytes',
-                                         ['type'], registry=self.registry)
-        
-        # L2ARC metrics
-        self.zfs_l2arc_hits = Counter('node_zfs_l2arc_hits_total', 'ZFS L2ARC hits', registry=self.registry)
-        self.zfs_l2arc_misses = Counter('node_zfs_l2arc_misses_total', 'ZFS L2ARC misses', registry=self.registry)
-        self.zfs_l2arc_size = Gauge('node_zfs_l2arc_size_bytes', 'ZFS L2ARC size', registry=self.registry)
-        
-        # Pool metrics
-        self.zpool_health = Gauge('node_zfs_zpool_health', 'ZFS pool health (0=online, 1=degraded, 2=faulted)',
-                                 ['pool'], registry=self.registry)
-        self.zpool_size = Gauge('node_zfs_zpool_size_bytes', 'ZFS pool size',
-                               ['pool'], registry=self.registry)
-        self.zpool_free = Gauge('node_zfs_zpool_free_bytes', 'ZFS pool free',
-                               ['pool'], registry=self.registry)
-        self.zpool_allocated = Gauge('node_zfs_zpool_allocated_bytes', 'ZFS pool allocated',
-                                    ['pool'], registry=self.registry)
-        self.zpool_fragmentation = Gauge('node_zfs_zpool_fragmentation_percent', 'ZFS pool fragmentation',
-                                        ['pool'], registry=self.registry)
-        self.zpool_dedup = Gauge('node_zfs_zpool_deduplication_ratio', 'ZFS pool deduplication ratio',
-                                ['pool'], registry=self.registry)
-        self.zpool_scrub_state = Gauge('node_zfs_zpool_scrub_state', 'ZFS pool scrub state',
-                                      ['pool', 'state'], registry=self.registry)
-        self.zpool_errors = Counter('node_zfs_zpool_errors_total', 'ZFS pool errors',
-                                   ['pool', 'type'], registry=self.registry)
+        self._register_metrics(ZFS_METRICS)
+        self.zfs_collector = SnapshotCollector()
+        self.registry.register(self.zfs_collector)
     
     def _init_vm_metrics(self):
         """Initialize VM/Container metrics"""
-        self.vm_count = Gauge('pve_vm_count', 'Number of VMs/Containers',
-                             ['type', 'status'], registry=self.registry)
-        self.vm_cpu_usage = Gauge('pve_vm_cpu_usage_percent', 'VM CPU usage',
-                                 ['vmid', 'name', 'type'], registry=self.registry)
-        self.vm_memory_total = Gauge('pve_vm_memory_total_bytes', 'VM total memory',
-                                    ['vmid', 'name', 'type'], registry=self.registry)
-        self.vm_memory_used = Gauge('pve_vm_memory_used_bytes', 'VM used memory',
-                                   ['vmid', 'name', 'type'], registry=self.registry)
-        self.vm_status = Gauge('pve_vm_status', 'VM status (1=running, 0=stopped)',
-                              ['vmid', 'name', 'type'], registry=self.registry)
-        self.vm_disk_read = Counter('pve_vm_disk_read_bytes_total', 'VM disk read bytes',
-                                   ['vmid', 'name', 'type'], registry=self.registry)
-        self.vm_disk_write = Counter('pve_vm_disk_write_bytes_total', 'VM disk write bytes',
-                                    ['vmid', 'name', 'type'], registry=self.registry)
-        self.vm_net_rx = Counter('pve_vm_network_receive_bytes_total', 'VM network receive bytes',
-                                ['vmid', 'name', 'type'], registry=self.registry)
-        self.vm_net_tx = Counter('pve_vm_network_transmit_bytes_total', 'VM network transmit bytes',
-                                ['vmid', 'name', 'type'], registry=self.registry)
-        self.vm_uptime = Gauge('pve_vm_uptime_seconds', 'VM uptime',
-                              ['vmid', 'name', 'type'], registry=self.registry)
+        self._register_metrics(VM_METRICS)
+        self.vm_collector = SnapshotCollector()
+        self.registry.register(self.vm_collector)
     
     def _init_container_metrics(self):
         """Initialize Docker/Podman container metrics"""
-        self.container_count = Gauge('node_container_count', 'Number of containers',
-                                    ['runtime', 'state'], registry=self.registry)
-        self.container_cpu = Gauge('node_container_cpu_usage_percent', 'Container CPU usage',
-                                   ['name', 'id', 'runtime'], registry=self.registry)
-        self.container_memory = Gauge('node_container_memory_usage_bytes', 'Container memory usage',
-                                     ['name', 'id', 'runtime'], registry=self.registry)
-        self.container_memory_limit = Gauge('node_container_memory_limit_bytes', 'Container memory limit',
-                                           ['name', 'id', 'runtime'], registry=self.registry)
-        self.container_network_rx = Counter('node_container_network_receive_bytes_total', 'Container network RX',
-                                           ['name', 'id', 'runtime'], registry=self.registry)
-        self.container_network_tx = Counter('node_container_network_transmit_bytes_total', 'Container network TX',
-                                           ['name', 'id', 'runtime'], registry=self.registry)
-        self.container_status = Gauge('node_container_status', 'Container status',
-                                     ['name', 'id', 'runtime', 'status'], registry=self.registry)
-        self.container_restarts = Counter('node_container_restarts_total', 'Container restart count',
-                                         ['name', 'id', 'runtime'], registry=self.registry)
+        self._register_metrics(CONTAINER_METRICS)
+        self.container_collector = SnapshotCollector()
+        self.registry.register(self.container_collector)
+        self.container_pool = WorkerPool(8)
     
     def _init_smart_metrics(self):
         """Initialize SMART disk metrics"""
-        self.smart_healthy = Gauge('node_disk_smart_healthy', 'SMART health status',
-                                  ['device', 'model', 'serial'], registry=self.registry)
-        self.smart_temperature = Gauge('node_disk_smart_temperature_celsius', 'Disk temperature',
-                                      ['device', 'model'], registry=self.registry)
-        self.smart_power_on_hours = Counter('node_disk_smart_power_on_hours', 'Power on hours',
-                                           ['device', 'model'], registry=self.registry)
-        self.smart_power_cycles = Counter('node_disk_smart_power_cycles', 'Power cycles',
-                                         ['device', 'model'], registry=self.registry)
-        self.smart_reallocated_sectors = Gauge('node_disk_smart_reallocated_sectors', 'Reallocated sectors',
-                                              ['device', 'model'], registry=self.registry)
-        self.smart_pending_sectors = Gauge('node_disk_smart_pending_sectors', 'Pending sectors',
-                                          ['device', 'model'], registry=self.registry)
-        self.smart_uncorrectable_sectors = Gauge('node_disk_smart_uncorrectable_sectors', 'Uncorrectable sectors',
-                                                ['device', 'model'], registry=self.registry)
-        self.smart_raw_read_error_rate = Gauge('node_disk_smart_raw_read_error_rate', 'Raw read error rate',
-                                              ['device', 'model'], registry=self.registry)
-        self.smart_seek_error_rate = Gauge('node_disk_smart_seek_error_rate', 'Seek error rate',
-                                          ['device', 'model'], registry=self.registry)
-        self.smart_spin_retry_count = Gauge('node_disk_smart_spin_retry_count', 'Spin retry count',
-                                           ['device', 'model'], registry=self.registry)
-        self.smart_ssd_wearout = Gauge('node_disk_smart_ssd_wearout_percent', 'SSD wearout indicator',
-                                       ['device', 'model'], registry=self.registry)
+        self._register_metrics(SMART_METRICS)
+        self.smart_collector = SnapshotCollector()
+        self.registry.register(self.smart_collector)
+        self.smart_pool = WorkerPool(4)
     
     def _init_ipmi_metrics(self):
         """Initialize IPMI sensor metrics"""
-        self.ipmi_sensor_value = Gauge('node_ipmi_sensor_value', 'IPMI sensor value',
-                                      ['name', 'type', 'unit'], registry=self.registry)
-        self.ipmi_sensor_state = Gauge('node_ipmi_sensor_state', 'IPMI sensor state',
-                                      ['name', 'type', 'state'], registry=self.registry)
-        self.ipmi_fan_speed = Gauge('node_ipmi_fan_speed_rpm', 'IPMI fan speed',
-                                   ['name'], registry=self.registry)
-        self.ipmi_temperature = Gauge('node_ipmi_temperature_celsius', 'IPMI temperature',
-                                     ['name', 'location'], registry=self.registry)
-        self.ipmi_voltage = Gauge('node_ipmi_voltage_volts', 'IPMI voltage',
-                                 ['name', 'rail'], registry=self.registry)
-        self.ipmi_power = Gauge('node_ipmi_power_watts', 'IPMI power consumption',
-                               ['name'], registry=self.registry)
+        self._register_metrics(IPMI_METRICS)
+        self.ipmi_shell = IpmiShell()
     
     def _init_systemd_metrics(self):
         """Initialize systemd metrics"""
-        self.systemd_units = Gauge('node_systemd_unit_state', 'Systemd unit state',
-                                  ['name', 'state', 'type'], registry=self.registry)
-        self.systemd_unit_start_time = Gauge('node_systemd_unit_start_time_seconds', 'Unit start time',
-                                            ['name'], registry=self.registry)
-        self.systemd_system_running = Gauge('node_systemd_system_running', 'Systemd system state', 
-                                           registry=self.registry)
-        self.systemd_units_total = Gauge('node_systemd_units', 'Total systemd units by state',
-                                        ['state'], registry=self.registry)
-        self.systemd_timer_last_trigger = Gauge('node_systemd_timer_last_trigger_seconds', 'Timer last trigger',
-                                               ['name'], registry=self.registry)
+        self._register_metrics(SYSTEMD_METRICS)
+        self.systemd_collector = SnapshotCollector()
+        self.registry.register(self.systemd_collector)
     
     def _init_mdadm_metrics(self):
         """Initialize mdadm RAID metrics"""
-        self.mdadm_array_state = Gauge('node_md_state', 'MD array state',
-                                      ['device', 'state'], registry=self.registry)
-        self.mdadm_disks_total = Gauge('node_md_disks', 'Total disks in array',
-                                      ['device'], registry=self.registry)
-        self.mdadm_disks_active = Gauge('node_md_disks_active', 'Active disks in array',
-                                       ['device'], registry=self.registry)
-        self.mdadm_disks_failed = Gauge('node_md_disks_failed', 'Failed disks in array',
-                                       ['device'], registry=self.registry)
-        self.mdadm_disks_spare = Gauge('node_md_disks_spare', 'Spare disks in array',
-                                      ['device'], registry=self.registry)
-        self.mdadm_blocks_total = Gauge('node_md_blocks_total', 'Total blocks in array',
-                                       ['device'], registry=self.registry)
-        self.mdadm_blocks_synced = Gauge('node_md_blocks_synced', 'Synced blocks in array',
-                                        ['device'], registry=self.registry)
-        self.mdadm_sync_action = Info('node_md_sync_action', 'Current sync action',
-                                     registry=self.registry)
-        self.mdadm_sync_completed = Gauge('node_md_sync_completed_percent', 'Sync completion percentage',
-                                         ['device'], registry=self.registry)
-        self.mdadm_sync_speed = Gauge('node_md_sync_speed_kb_per_sec', 'Sync speed',
-                                     ['device'], registry=self.registry)
+        self._register_metrics(MDADM_METRICS)
     
     def _init_ups_metrics(self):
         """Initialize UPS metrics"""
-        self.ups_status = Info('node_ups_status', 'UPS status information', registry=self.registry)
-        self.ups_battery_charge = Gauge('node_ups_battery_charge_percent', 'Battery charge percentage',
-                                       ['ups'], registry=self.registry)
-        self.ups_battery_runtime = Gauge('node_ups_battery_runtime_seconds', 'Battery runtime remaining',
-                                        ['ups'], registry=self.registry)
-        self.ups_battery_voltage = Gauge('node_ups_battery_voltage', 'Battery voltage',
-                                        ['ups'], registry=self.registry)
-        self.ups_input_voltage = Gauge('node_ups_input_voltage', 'Input voltage',
-                                      ['ups'], registry=self.registry)
-        self.ups_output_voltage = Gauge('node_ups_output_voltage', 'Output voltage',
-                                       ['ups'], registry=self.registry)
-        self.ups_load_percent = Gauge('node_ups_load_percent', 'UPS load percentage',
-                                     ['ups'], registry=self.registry)
-        self.ups_temperature = Gauge('node_ups_temperature_celsius', 'UPS temperature',
-                                    ['ups'], registry=self.registry)
-        self.ups_on_battery = Gauge('node_ups_on_battery', 'UPS is on battery power',
-                                   ['ups'], registry=self.registry)
+        self._register_metrics(UPS_METRICS)
     
     def _init_btrfs_metrics(self):
         """Initialize Btrfs metrics"""
-        self.btrfs_allocation = Gauge('node_btrfs_allocation_bytes', 'Btrfs allocation',
-                                     ['uuid', 'label', 'type'], registry=self.registry)
-        self.btrfs_used = Gauge('node_btrfs_used_bytes', 'Btrfs used space',
-                               ['uuid', 'label', 'type'], registry=self.registry)
-        self.btrfs_device_size = Gauge('node_btrfs_device_size_bytes', 'Btrfs device size',
-                                      ['uuid', 'label', 'device'], registry=self.registry)
-        self.btrfs_device_errors = Counter('node_btrfs_device_errors_total', 'Btrfs device errors',
-                                          ['uuid', 'label', 'device', 'type'], registry=self.registry)
+        self._register_metrics(BTRFS_METRICS)
     
     def _init_exporter_metrics(self):
         """Initialize exporter statistics"""
-        self.collection_errors = Counter('node_exporter_collection_errors_total', 'Collection errors',
-                                        ['collector'], registry=self.registry)
-        self.collection_duration = Histogram('node_exporter_collection_duration_seconds', 'Collection duration',
-                                           ['collector'], registry=self.registry)
-        self.collection_success = Gauge('node_exporter_collection_success', 'Collection success',
-                                       ['collector'], registry=self.registry)
-        self.feature_enabled = Gauge('node_exporter_feature_enabled', 'Feature detection status',
-                                    ['feature'], registry=self.registry)
-        self.exporter_info = Info('node_exporter_info', 'Exporter information', registry=self.registry)
-        self.scrape_collector_duration = Summary('node_scrape_collector_duration_seconds', 
-                                                'Duration of a collector scrape',
-                                                ['collector'], registry=self.registry)
-        self.scrape_collector_success = Gauge('node_scrape_collector_success', 
-                                             'Whether a collector succeeded',
-                                             ['collector'], registry=self.registry)
-    
-    @timed_operation(timeout=10)
+        self._register_metrics(EXPORTER_METRICS)
+    
+    def _set_static_info(self):
+        """Publish node, kernel, feature and exporter info, which are fixed for the process lifetime"""
+        # Feature info; features are not re-detected while the exporter runs
+        self.node_features.info({
+            feature: str(enabled) for feature, enabled in self.features.items()
+        })
+        
+        # Set feature gauges
+        for feature, enabled in self.features.items():
+            self.feature_enabled.labels(feature=feature).set(1 if enabled else 0)
+        
+        # Exporter info
+        self.exporter_info.info({
+            'version': '2.0.0',
+            'start_time': str(self.start_time)
+        })
+        self.boot_time.set(self.boot_timestamp)
+        
+        # Node info
+        self.node_info.info({
+            'hostname': self.hostname,
+            'kernel': platform.release(),
+            'os': platform.system(),
+            'os_version': platform.version(),
+            'architecture': platform.machine(),
+            'processor': platform.processor() or 'unknown',
+            'python_version': platform.python_version()
+        })
+        
+        # Kernel version info
+        self.kernel_version.info({
+            'release': platform.release(),
+            'version': platform.version()
+        })
+    
+    def _read_pve_version(self):
+        """Installed pve-manager version, or None outside PVE"""
+        try:
+            if _which('pveversion'):
+                # Plain pveversion prints just the pve-manager line; --verbose
+                # queries dpkg for every PVE package only to have them discarded
+                result = subprocess.run(['pveversion'],
+                                      timeout=2, **_RUN_KW)
+                if result.returncode == 0:
+                    match = _RE_PVE_VERSION.search(result.stdout)
+                    if match:
+                        return match.group(1)
+        except (OSError, subprocess.SubprocessError) as e:
+            logger.debug("pveversion failed: %s", e)
+        return None
+    
+    @collector('base')
     def collect_base_metrics(self):
         """Collect base system metrics"""
+        # PVE version; it only moves on a package upgrade, which the exporter
+        # outlives, so pveversion is re-run hourly rather than every collection
+        pve_version = self.cache.get('pve_version', self._read_pve_version, ttl=PVE_VERSION_TTL)
+        if pve_version:
+            self.pve_version.info({'version': pve_version})
+        
+        # Time metrics
+        now = time.time()
+        self.uptime_seconds.set(now - self.boot_timestamp)
+        self.time_seconds.set(now)
+        
+        # Timezone offset, straight from the C struct tm (follows DST changes)
+        self.time_zone_offset.set(time.localtime(now).tm_gmtoff)
+        
+        # CPU metrics; counts only move on hotplug, so they are re-probed
+        # once a minute and the gauges touched only when they change
+        cpu_counts = self.cache.get('cpu_counts', self._count_cpus, ttl=60)
+        if cpu_counts != self.cpu_counts:
+            for cpu_type, count in cpu_counts.items():
+                self.cpu_count.labels(type=cpu_type).set(count)
+            self.cpu_counts = cpu_counts
+        
+        # CPU times and usage; the kernel rebuilds every per-CPU and per-IRQ
+        # line on each /proc/stat read, so one read also feeds the kernel counters
         try:
-            with self.collection_duration.labels(collector='base').time():
-                # Node info
-                self.node_info.info({
-                    'hostname': self.hostname,
-                    'kernel': platform.release(),
-                    'os': platform.system(),
-                    'os_version': platform.version(),
-                    'architecture': platform.machine(),
-                    'processor': platform.processor() or 'unknown',
-                    'python_version': platform.python_version()
-                })
-                
-                # Kernel version info
-                self.kernel_version.info({
-                    'release': platform.release(),
-                    'version': platform.version()
-                })
-                
-                # Feature info
-                self.node_features.info({
-                    feature: str(enabled) for feature, enabled in self.features.items()
-                })
-                
-                # Set feature gauges
-                for feature, enabled in self.features.items():
-                    self.feature_enabled.labels(feature=feature).set(1 if enabled else 0)
-                
-                # Exporter info
-                self.exporter_info.info({
-                    'version': '2.0.0',
-                    'start_time': str(self.start_time)
-                })
-                
-                # PVE version
-                if shutil.which('pveversion'):
-                    result = subprocess.run(['pveversion', '--verbose'], 
-                                          capture_output=True, text=True, timeout=2)
-                    if result.returncode == 0:
-                        for line in result.stdout.split('\n'):
-                            if line.startswith('pve-manager'):
-                                version = line.split('/')[1].split()[0] if '/' in line else 'unknown'
-                                self.pve_version.info({'version': version})
-                                break
-                
-                # Time metrics
-                self.boot_time.set(psutil.boot_time())
-                self.uptime_seconds.set(time.time() - psutil.boot_time())
-                self.time_seconds.set(time.time())
-                
-                # Timezone offset
-                import datetime
-                utc_offset = datetime.datetime.now(datetime.timezone.utc).astimezone().utcoffset()
-                if utc_offset:
-                    self.time_zone_offset.set(utc_offset.total_seconds())
-                
-                # CPU metrics
-                self.cpu_count.labels(type='logical').set(psutil.cpu_count(logical=True))
-                self.cpu_count.labels(type='physical').set(psutil.cpu_count(logical=False) or 0)
-                
-                # CPU times and usage
-                cpu_times = psutil.cpu_times(percpu=True)
-                cpu_percent = psutil.cpu_percent(percpu=True, interval=None)
-                
-                for i, times in enumerate(cpu_times):
-                    cpu_label = f'cpu{i}'
-                    self.cpu_usage.labels(cpu=cpu_label, mode='user').set(times.user)
-                    self.cpu_usage.labels(cpu=cpu_label, mode='system').set(times.system)
-                    self.cpu_usage.labels(cpu=cpu_label, mode='idle').set(times.idle)
-                    self.cpu_usage.labels(cpu=cpu_label, mode='iowait').set(getattr(times, 'iowait', 0))
-                    self.cpu_usage.labels(cpu=cpu_label, mode='irq').set(getattr(times, 'irq', 0))
-                    self.cpu_usage.labels(cpu=cpu_label, mode='softirq').set(getattr(times, 'softirq', 0))
-                    self.cpu_usage.labels(cpu=cpu_label, mode='steal').set(getattr(times, 'steal', 0))
-                    self.cpu_usage.labels(cpu=cpu_label, mode='guest').set(getattr(times, 'guest', 0))
-                    
-                    if i < len(cpu_percent):
-                        self.cpu_percent.labels(cpu=cpu_label).set(cpu_percent[i])
-                
-                # CPU frequency
-                try:
-                    freq = psutil.cpu_freq(percpu=True)
-                    if freq:
-                        for i, f in enumerate(freq):
-                            cpu_label = f'cpu{i}'
-                            self.cpu_frequency.labels(cpu=cpu_label, type='current').set(f.current * 1000000)
-                            self.cpu_frequency.labels(cpu=cpu_label, type='min').set(f.min * 1000000)
-                            self.cpu_frequency.labels(cpu=cpu_label, type='max').set(f.max * 1000000)
-                except:
-                    pass
-                
-                # Check for CPU throttling (if available)
-                self._collect_cpu_throttling()
-                
-                # Load average
-                load = os.getloadavg()
-                self.load_1.set(load[0])
-                self.load_5.set(load[1])
-                self.load_15.set(load[2])
-                
-                # Memory
-                mem = psutil.virtual_memory()
-                self.memory_total.set(mem.total)
-                self.memory_available.set(mem.available)
-                self.memory_free.set(mem.free)
-                self.memory_cached.set(getattr(mem, 'cached', 0))
-                self.memory_buffers.set(getattr(mem, 'buffers', 0))
-                self.memory_shared.set(getattr(mem, 'shared', 0))
-                self.memory_slab.set(getattr(mem, 'slab', 0))
-                
-                # Calculate memory pressure
-                pressure = 1.0 - (mem.available / mem.total)
-                self.memory_pressure_ratio.set(pressure)
-                
-                swap = psutil.swap_memory()
-                self.swap_total.set(swap.total)
-                self.swap_free.set(swap.free)
-                if swap.total > 0:
-                    self.swap_used_percent.set((swap.total - swap.free) / swap.total * 100)
-                
-                # Disk metrics
-                self._collect_disk_metrics()
-                
-                # Network metrics
-                self._collect_network_metrics()
-                
-                # Process metrics
-                self._collect_process_metrics()
-                
-                # Advanced metrics
-                self._collect_advanced_system_metrics()
-                
-                self.collection_success.labels(collector='base').set(1)
-                
-        except Exception as e:
-            logger.error(f"Error collecting base metrics: {e}")
-            self.collection_errors.labels(collector='base').inc()
-            self.collection_success.labels(collector='base').set(0)
+            stat = _read_proc('/proc/stat')
+        except OSError:
+            stat = b''
+        cpu_ticks = self._read_cpu_ticks(stat)
+        handles = self._cpu_handles(len(cpu_ticks))
+        previous = self.cpu_totals
+        totals = []
+        for i, ticks in enumerate(cpu_ticks):
+            usage, percent, _ = handles[i]
+            for set_seconds, field in usage:
+                set_seconds(ticks[field] / CLOCK_TICKS)
+            
+            # Busy share of the ticks since the last scrape, computed the way
+            # psutil.cpu_percent does (guest time is already inside user)
+            total = sum(ticks[:8])
+            idle = ticks[3] + ticks[4]
+            totals.append((total, idle))
+            if i < len(previous):
+                elapsed = total - previous[i][0]
+                if elapsed > 0:
+                    percent.set((elapsed - (idle - previous[i][1])) / elapsed * 100)
+        self.cpu_totals = totals
+        
+        # CPU frequency; the scaling limits are read along with the file list,
+        # so each collection reads only scaling_cur_freq per CPU
+        try:
+            cpufreq_files = self.cache.get('cpufreq_files', self._find_cpufreq_files, ttl=300)
+            if cpufreq_files:
+                for (current_path, min_hz, max_hz), (_, _, frequency) in zip(cpufreq_files, handles):
+                    frequency[0].set(int(_read_proc(current_path, 32)) * 1000)
+                    frequency[1].set(min_hz)
+                    frequency[2].set(max_hz)
+            else:
+                # No cpufreq driver (typical in VMs); psutil falls back to /proc/cpuinfo
+                freq = psutil.cpu_freq(percpu=True)
+                if freq:
+                    for f, (_, _, frequency) in zip(freq, handles):
+                        frequency[0].set(f.current * 1000000)
+                        frequency[1].set(f.min * 1000000)
+                        frequency[2].set(f.max * 1000000)
+        except (OSError, ValueError):
+            pass
+        
+        # Check for CPU throttling (if available)
+        self._collect_cpu_throttling()
+        
+        # Load average; the fourth /proc/loadavg field is runnable/total
+        # scheduling entities, which gives the thread total without a process walk
+        loadavg = _read_proc('/proc/loadavg', 128).split()
+        self.load_1.set(float(loadavg[0]))
+        self.load_5.set(float(loadavg[1]))
+        self.load_15.set(float(loadavg[2]))
+        self.threads_total.set(int(loadavg[3].partition(b'/')[2]))
+        
+        # Memory
+        self._collect_memory_metrics()
+        
+        # Disk metrics
+        self._collect_disk_metrics()
+        
+        # Network metrics
+        self._collect_network_metrics()
+        
+        # Process metrics
+        self._collect_process_metrics(stat)
+        
+        # Advanced metrics
+        self._collect_advanced_system_metrics(stat)
+    
+    def _read_meminfo(self):
+        """Read the wanted /proc/meminfo fields, converted to bytes"""
+        return {key: int(value) << 10 for key, value in _RE_MEMINFO.findall(_read_proc('/proc/meminfo'))}
+    
+    def _collect_memory_metrics(self):
+        """Collect memory and swap metrics"""
+        try:
+            meminfo = self._read_meminfo()
+            total = meminfo[b'MemTotal']
+            available = meminfo.get(b'MemAvailable', meminfo[b'MemFree'])
+            self.memory_total.set(total)
+            self.memory_available.set(available)
+            self.memory_free.set(meminfo[b'MemFree'])
+            # Match psutil, which counts reclaimable slab as cache
+            self.memory_cached.set(meminfo.get(b'Cached', 0) + meminfo.get(b'SReclaimable', 0))
+            self.memory_buffers.set(meminfo.get(b'Buffers', 0))
+            self.memory_shared.set(meminfo.get(b'Shmem', 0))
+            self.memory_slab.set(meminfo.get(b'Slab', 0))
+            swap_total = meminfo.get(b'SwapTotal', 0)
+            swap_free = meminfo.get(b'SwapFree', 0)
+        except (OSError, KeyError, ValueError):
+            # Not Linux or an unexpected format, fall back to psutil
+            mem = psutil.virtual_memory()
+            total = mem.total
+            available = mem.available
+            self.memory_total.set(total)
+            self.memory_available.set(available)
+            self.memory_free.set(mem.free)
+            self.memory_cached.set(getattr(mem, 'cached', 0))
+            self.memory_buffers.set(getattr(mem, 'buffers', 0))
+            self.memory_shared.set(getattr(mem, 'shared', 0))
+            self.memory_slab.set(getattr(mem, 'slab', 0))
+            swap = psutil.swap_memory()
+            swap_total = swap.total
+            swap_free = swap.free
+        
+        # Calculate memory pressure
+        self.memory_pressure_ratio.set(1.0 - (available / total))
+        
+        self.swap_total.set(swap_total)
+        self.swap_free.set(swap_free)
+        if swap_total > 0:
+            self.swap_used_percent.set((swap_total - swap_free) / swap_total * 100)
+    
+    def _count_cpus(self):
+        """Logical and physical CPU counts"""
+        return {
+            'logical': psutil.cpu_count(logical=True),
+            'physical': psutil.cpu_count(logical=False) or 0,
+        }
+    
+    def _read_cpu_ticks(self, stat):
+        """Per-CPU /proc/stat columns (user, nice, system, idle, iowait, irq, softirq, steal, guest, ...) in ticks"""
+        try:
+            cpu_ticks = []
+            # The aggregate 'cpu ' line comes first and is skipped; per-CPU lines follow it
+            for line in stat.split(b'\n')[1:]:
+                if not line.startswith(b'cpu'):
+                    break
+                ticks = [int(value) for value in line.split()[1:]]
+                if len(ticks) < 9:
+                    ticks.extend([0] * (9 - len(ticks)))
+                cpu_ticks.append(ticks)
+            if cpu_ticks:
+                return cpu_ticks
+        except ValueError:
+            pass
+        # psutil exposes the same columns in the same order, in seconds
+        return [[round(value * CLOCK_TICKS) for value in times] for times in psutil.cpu_times(percpu=True)]
+    
+    def _cpu_handles(self, count):
+        """Per-CPU (usage, percent, frequency) children, rebound only when the CPU count changes"""
+        # Usage children are stored as (set method, /proc/stat column) pairs so the
+        # scrape loop does no attribute or mode lookups
+        if len(self.cpu_handles) != count:
+            handles = []
+            for i in range(count):
+                cpu = sys.intern(f'cpu{i}')
+                handles.append((
+                    tuple(
+                        (self.cpu_usage.labels(cpu=cpu, mode=mode).set, field)
+                        for mode, field in zip(CPU_MODES, CPU_STAT_FIELDS)
+                    ),
+                    self.cpu_percent.labels(cpu=cpu),
+                    tuple(self.cpu_frequency.labels(cpu=cpu, type=kind) for kind in ('current', 'min', 'max')),
+                ))
+            self.cpu_handles = handles
+        return self.cpu_handles
+    
+    def _find_cpufreq_files(self):
+        """(scaling_cur_freq path, min Hz, max Hz) per CPU, or None when cpufreq is not exposed for every CPU"""
+        files = []
+        for i in range(len(self.cpu_handles)):
+            base = f'/sys/devices/system/cpu/cpu{i}/cpufreq/'
+            try:
+                # sysfs reports kHz
+                files.append((
+                    base + 'scaling_cur_freq',
+                    int(_read_small(base + 'scaling_min_freq')) * 1000,
+                    int(_read_small(base + 'scaling_max_freq')) * 1000,
+                ))
+            except (OSError, ValueError):
+                return None
+        return files
     
     def _collect_cpu_throttling(self):
         """Collect CPU throttling information"""
+        throttle = build_families(THROTTLE_FAMILIES, ['cpu', 'type'])
+        for path, cpu, throttle_type in self.cache.get('throttle_files', self._find_throttle_files, ttl=3600):
+            try:
+                throttle['throttles'].add_metric([cpu, throttle_type], int(_read_small(path)))
+            except (OSError, ValueError):
+                pass
+        self.throttle_collector.update(throttle.values())
+    
+    def _find_throttle_files(self):
+        """List (path, cpu, type) for the Intel thermal throttle counters present"""
+        throttle_files = []
         try:
-            # Check for Intel CPU throttling
-            throttle_files = glob.glob('/sys/devices/system/cpu/cpu*/thermal_throttle/*_throttle_count')
-            for throttle_file in throttle_files:
-                try:
-                    cpu_match = re.search(r'cpu(\d+)', throttle_file)
-                    throttle_type = 'core' if 'core' in throttle_file else 'package'
-                    if cpu_match:
-                        cpu_num = cpu_match.group(1)
-                        with open(throttle_file, 'r') as f:
-                            count = int(f.read().strip())
-                            self.cpu_throttles.labels(cpu=f'cpu{cpu_num}', type=throttle_type)._value.set(count)
-                except:
-                    pass
-        except:
+            with os.scandir('/sys/devices/system/cpu') as entries:
+                for entry in entries:
+                    if not (entry.name.startswith('cpu') and entry.name[3:].isdigit()):
+                        continue
+                    for throttle_type in ('core', 'package'):
+                        path = f'{entry.path}/thermal_throttle/{throttle_type}_throttle_count'
+                        if os.path.exists(path):
+                            throttle_files.append((path, entry.name, throttle_type))
+        except OSError:
             pass
+        return throttle_files
     
     def _collect_disk_metrics(self):
         """Collect detailed disk metrics"""
         # Filesystem metrics
-        for partition in psutil.disk_partitions(all=False):
+        fs = build_families(FILESYSTEM_FAMILIES, ['device', 'mountpoint', 'fstype'])
+        mounts = _parse_mounts(_read_proc('/proc/self/mounts'), _read_proc('/proc/filesystems'))
+        for device, mountpoint, fstype, readonly in mounts:
             try:
-                if partition.fstype in ['tmpfs', 'devtmpfs', 'devfs']:
-                    continue
-                    
-                usage = psutil.disk_usage(partition.mountpoint)
-                self.fs_size.labels(
-                    device=partition.device,
-                    mountpoint=partition.mountpoint,
-                    fstype=partition.fstype
-                ).set(usage.total)
-                self.fs_free.labels(
-                    device=partition.device,
-                    mountpoint=partition.mountpoint,
-                    fstype=partition.fstype
-                ).set(usage.free)
-                self.fs_avail.labels(
-                    device=partition.device,
-                    mountpoint=partition.mountpoint,
-                    fstype=partition.fstype
-                ).set(usage.free)  # Simplified, should check available
-                
-                # Check if filesystem is readonly
-                ro = 1 if 'ro' in partition.opts else 0
-                self.fs_readonly.labels(
-                    device=partition.device,
-                    mountpoint=partition.mountpoint,
-                    fstype=partition.fstype
-                ).set(ro)
-                
-                # Try to get inode information
-                try:
-                    statvfs = os.statvfs(partition.mountpoint)
-                    self.fs_files.labels(
-                        device=partition.device,
-                        mountpoint=partition.mountpoint,
-                        fstype=partition.fstype
-                    ).set(statvfs.f_files)
-                    self.fs_files_free.labels(
-                        device=partition.device,
-                        mountpoint=partition.mountpoint,
-                        fstype=partition.fstype
-                    ).set(statvfs.f_ffree)
-                except:
-                    pass
-            except:
-                pass
+                statvfs = self._statvfs(mountpoint, fstype)
+            except OSError:
+                continue
+            if statvfs is None:
+                continue
+            
+            fs_labels = [device, mountpoint, fstype]
+            fs['size'].add_metric(fs_labels, statvfs.f_blocks * statvfs.f_frsize)
+            fs['free'].add_metric(fs_labels, statvfs.f_bfree * statvfs.f_frsize)
+            fs['avail'].add_metric(fs_labels, statvfs.f_bavail * statvfs.f_frsize)
+            fs['files'].add_metric(fs_labels, statvfs.f_files)
+            fs['files_free'].add_metric(fs_labels, statvfs.f_ffree)
+            fs['readonly'].add_metric(fs_labels, readonly)
+        self.fs_collector.update(fs.values())
         
-        # Disk I/O metrics
-        disk_io = psutil.disk_io_counters(perdisk=True, nowrap=True)
-        if disk_io:
-            for disk, counters in disk_io.items():
-                if not disk.startswith('loop') and not disk.startswith('ram'):
-                    self.disk_read_bytes.labels(device=disk)._value.set(counters.read_bytes)
-                    self.disk_written_bytes.labels(device=disk)._value.set(counters.write_bytes)
-                    self.disk_reads_completed.labels(device=disk)._value.set(counters.read_count)
-                    self.disk_writes_completed.labels(device=disk)._value.set(counters.write_count)
-                    self.disk_read_time.labels(device=disk)._value.set(counters.read_time / 1000.0)
-                    self.disk_write_time.labels(device=disk)._value.set(counters.write_time / 1000.0)
-                    
-                    if hasattr(counters, 'busy_time'):
-                        self.disk_io_time.labels(device=disk)._value.set(counters.busy_time / 1000.0)
-                        
-                        # Calculate utilization (approximation)
-                        # This would need to track time delta for accurate calculation
-                        if counters.busy_time > 0:
-                            # Simplified utilization calculation
-                            self.disk_utilization.labels(device=disk).set(min(100, counters.busy_time / 10))
-                    
-                    # Get queue depth from /sys/block if available
-                    try:
-                        queue_file = f'/sys/block/{disk}/queue/nr_requests'
-                        if os.path.exists(queue_file):
-                            with open(queue_file, 'r') as f:
-                                queue_depth = int(f.read().strip())
-                                self.disk_io_now.labels(device=disk).set(queue_depth)
-                    except:
-                        pass
+        # Disk I/O metrics, straight from /proc/diskstats into the families;
+        # sectors are always 512 bytes there and times are in milliseconds
+        disk = build_families(DISK_FAMILIES, ['device'])
+        try:
+            diskstats = _read_proc('/proc/diskstats')
+        except OSError:
+            diskstats = b''
+        block_devices = self.cache.get('block_devices', self._list_block_devices, ttl=60)
+        for line in diskstats.split(b'\n'):
+            fields = line.split()
+            if len(fields) < 14 or fields[2] not in block_devices:
+                continue
+            labels = [fields[2].decode()]
+            disk['reads_completed'].add_metric(labels, int(fields[3]))
+            disk['read_bytes'].add_metric(labels, int(fields[5]) * 512)
+            disk['read_time'].add_metric(labels, int(fields[6]) / 1000.0)
+            disk['writes_completed'].add_metric(labels, int(fields[7]))
+            disk['written_bytes'].add_metric(labels, int(fields[9]) * 512)
+            disk['write_time'].add_metric(labels, int(fields[10]) / 1000.0)
+            # I/Os currently in flight, not the configured queue size
+            disk['io_now'].add_metric(labels, int(fields[11]))
+            
+            busy_time = int(fields[12])
+            disk['io_time'].add_metric(labels, busy_time / 1000.0)
+            # Calculate utilization (approximation)
+            # This would need to track time delta for accurate calculation
+            if busy_time > 0:
+                disk['utilization'].add_metric(labels, min(100, busy_time / 10))
+        self.disk_collector.update(disk.values())
+    
+    def _list_block_devices(self):
+        """Names of the whole block devices worth exporting, as they appear in /proc/diskstats"""
+        # /sys/block holds whole disks only; partitions are already summed into
+        # their disk, and loop/ram devices are noise on container hosts
+        try:
+            with os.scandir('/sys/block') as entries:
+                return frozenset(
+                    entry.name.encode() for entry in entries
+                    if not entry.name.startswith(('loop', 'ram'))
+                )
+        except OSError:
+            return frozenset()
+    
+    def _statvfs(self, mountpoint, fstype):
+        """statvfs a mount, waiting at most SLOW_STATVFS_TIMEOUT on non-local filesystems"""
+        if fstype in LOCAL_FILESYSTEMS:
+            return os.statvfs(mountpoint)
+        
+        # A hung server blocks statvfs indefinitely, so the call runs in a helper
+        # thread; while one is still stuck, no second probe is started
+        if mountpoint not in self.statvfs_pending:
+            self.statvfs_pending.add(mountpoint)
+            probe = threading.Thread(target=self._refresh_statvfs, args=(mountpoint,), name='statvfs', daemon=True)
+            probe.start()
+            probe.join(SLOW_STATVFS_TIMEOUT)
+            if not probe.is_alive():
+                return self.statvfs_cache.get(mountpoint)
+        
+        logger.debug("statvfs on %s is slow, reusing the last value", mountpoint)
+        self.collection_errors.labels(collector='disk_slow').inc()
+        return self.statvfs_cache.get(mountpoint)
+    
+    def _refresh_statvfs(self, mountpoint):
+        """Store a fresh statvfs result for a mount (runs in a helper thread)"""
+        try:
+            self.statvfs_cache[mountpoint] = os.statvfs(mountpoint)
+        except OSError:
+            self.statvfs_cache.pop(mountpoint, None)
+        finally:
+            self.statvfs_pending.discard(mountpoint)
     
     def _collect_network_metrics(self):
         """Collect detailed network metrics"""
+        net = build_families(NETWORK_FAMILIES, ['device'])
         net_io = psutil.net_io_counters(pernic=True, nowrap=True)
         net_if_stats = psutil.net_if_stats()
-        net_if_addrs = psutil.net_if_addrs()
         
         for interface, counters in net_io.items():
             # Skip loopback unless explicitly requested
             if interface == 'lo' and not DEBUG_MODE:
                 continue
             
-            self.net_bytes_recv.labels(device=interface)._value.set(counters.bytes_recv)
-            self.net_bytes_sent.labels(device=interface)._value.set(counters.bytes_sent)
-            self.net_packets_recv.labels(device=interface)._value.set(counters.packets_recv)
-            self.net_packets_sent.labels(device=interface)._value.set(counters.packets_sent)
-            self.net_errs_recv.labels(device=interface)._value.set(counters.errin)
-            self.net_errs_sent.labels(device=interface)._value.set(counters.errout)
-            self.net_drop_recv.labels(device=interface)._value.set(counters.dropin)
-            self.net_drop_sent.labels(device=interface)._value.set(counters.dropout)
+            labels = [interface]
+            net['bytes_recv'].add_metric(labels, counters.bytes_recv)
+            net['bytes_sent'].add_metric(labels, counters.bytes_sent)
+            net['packets_recv'].add_metric(labels, counters.packets_recv)
+            net['packets_sent'].add_metric(labels, counters.packets_sent)
+            net['errs_recv'].add_metric(labels, counters.errin)
+            net['errs_sent'].add_metric(labels, counters.errout)
+            net['drop_recv'].add_metric(labels, counters.dropin)
+            net['drop_sent'].add_metric(labels, counters.dropout)
             
             # Interface stats
             if interface in net_if_stats:
                 stats = net_if_stats[interface]
-                self.net_up.labels(device=interface).set(1 if stats.isup else 0)
-                self.net_speed.labels(device=interface).set(stats.speed * 1000000 if stats.speed > 0 else 0)
-                self.net_mtu.labels(device=interface).set(stats.mtu)
-    
-    def _collect_process_metrics(self):
-        """Collect process and thread metrics"""
-        process_count = {'running': 0, 'sleeping': 0, 'blocked': 0, 'zombie': 0, 'total': 0}
-        thread_count = 0
+                net['up'].add_metric(labels, 1 if stats.isup else 0)
+                net['speed'].add_metric(labels, stats.speed * 1000000 if stats.speed > 0 else 0)
+                net['mtu'].add_metric(labels, stats.mtu)
+        self.net_collector.update(net.values())
+    
+    def _collect_process_metrics(self, stat):
+        """Collect process metrics"""
+        # Runnable and blocked counts are kernel totals in /proc/stat, so the
+        # per-process walk is only needed for the top-N ranking, which is lower
+        # resolution and only recomputed every 30 seconds
+        for key, gauge in ((b'procs_running', self.processes_running), (b'procs_blocked', self.processes_blocked)):
+            value = _stat_field(stat, key)
+            if value is not None:
+                gauge.set(value)
+        
+        if not self.proc_ticks or time.monotonic() - self.proc_scan_time >= 30:
+            process_total, (top_cpu, top_mem) = self._scan_processes()
+            self._set_top_processes('cpu', top_cpu, self.top_cpu_percent, self.top_cpu_process)
+            self._set_top_processes('memory', top_mem, self.top_mem_percent, self.top_mem_process)
+        else:
+            # One directory listing, no per-process reads
+            with os.scandir('/proc') as entries:
+                process_total = sum(1 for entry in entries if entry.name.isdigit())
+        self.processes_total.set(process_total)
+    
+    def _set_top_processes(self, kind, top, percent_gauge, process_gauge):
+        """Export a (percent, pid, name) ranking, replacing identity series only where the process changed"""
+        previous = self.top_processes[kind]
+        current = [(str(rank), name, str(pid)) for rank, (_, pid, name) in enumerate(top)]
+        
+        for labels in set(previous).difference(current):
+            process_gauge.remove(*labels)
+        for labels in set(current).difference(previous):
+            process_gauge.labels(*labels).set(1)
+        self.top_processes[kind] = current
+        
+        for rank, (percent, _, _) in enumerate(top):
+            percent_gauge.labels(str(rank)).set(percent)
+        for rank in range(len(top), len(previous)):
+            percent_gauge.remove(str(rank))
+    
+    def _scan_processes(self):
+        """Count processes and rank the top 5 by CPU and memory from /proc/[pid]/stat"""
+        total = 0
         top_cpu_procs = []
         top_mem_procs = []
         
-        for proc in psutil.process_iter(['pid', 'name', 'status', 'cpu_percent', 'memory_percent', 'num_threads']):
-            try:
-                info = proc.info
-                process_count['total'] += 1
-                
-                status = info.get('status', '')
-                if status == psutil.STATUS_RUNNING:
-                    process_count['running'] += 1
-                elif status == psutil.STATUS_SLEEPING:
-                    process_count['sleeping'] += 1
-                elif status in [psutil.STATUS_DISK_SLEEP, psutil.STATUS_UNINTERRUPTIBLE_SLEEP]:
-                    process_count['blocked'] += 1
-                elif status == psutil.STATUS_ZOMBIE:
-                    process_count['zombie'] += 1
+        def push_top(heap, percent, pid, name):
+            if len(heap) < 5:
+                heapq.heappush(heap, (percent, pid, name))
+            else:
+                heapq.heapreplace(heap, (percent, pid, name))
+        
+        # CPU usage is the change in utime+stime since the previous ranking, keyed
+        # by (pid, starttime) so a recycled pid never inherits another's ticks
+        now = time.monotonic()
+        elapsed = now - self.proc_scan_time
+        previous = self.proc_ticks
+        current = {}
+        try:
+            mem_total = self._read_meminfo()[b'MemTotal']
+        except (OSError, KeyError, ValueError):
+            mem_total = psutil.virtual_memory().total
+        
+        # The loop body runs once per process, so the globals it needs are
+        # fetched once here and reached as locals inside it
+        read_stat = _read_small
+        ticks_per_second = CLOCK_TICKS
+        page_size = PAGE_SIZE
+        
+        with os.scandir('/proc') as entries:
+            for entry in entries:
+                pid = entry.name
+                if not pid.isdigit():
+                    continue
+                try:
+                    data = read_stat(f'/proc/{pid}/stat', 1024)
+                    # comm may itself contain spaces or ')', so fields resume after the last ')';
+                    # nothing past rss (index 21) is used, so the other ~30 fields stay unsplit
+                    comm_end = data.rindex(b')')
+                    fields = data[comm_end + 2:].split(None, 22)
+                    ticks = int(fields[11]) + int(fields[12])
+                    rss = int(fields[21]) * page_size
+                except (OSError, ValueError, IndexError):
+                    continue  # process exited mid-scan
                 
-                thread_count += info.get('num_threads', 1)
+                total += 1
+                key = (pid, fields[19])
+                current[key] = ticks
+                last = previous.get(key)
+                cpu = (ticks - last) / ticks_per_second / elapsed * 100 if last is not None else 0
                 
-                # Track top processes
-                if info.get('cpu_percent', 0) > 0:
-                    top_cpu_procs.append({
-                        'pid': info['pid'],
-                        'name': info['name'],
-                        'cpu': info.get('cpu_percent', 0)
-                    })
-                if info.get('memory_percent', 0) > 0:
-                    top_mem_procs.append({
-                        'pid': info['pid'],
-                        'name': info['name'],
-                        'memory': info.get('memory_percent', 0)
-                    })
-            except:
-                pass
+                # Track top processes in size-5 min-heaps of (percent, pid, comm);
+                # most processes lose to the current 5th place, so the comparison
+                # runs before anything is allocated for them
+                if cpu > 0 and (len(top_cpu_procs) < 5 or cpu > top_cpu_procs[0][0]):
+                    push_top(top_cpu_procs, cpu, int(pid), data[data.index(b'(') + 1:comm_end])
+                mem = rss / mem_total * 100
+                if mem > 0 and (len(top_mem_procs) < 5 or mem > top_mem_procs[0][0]):
+                    push_top(top_mem_procs, mem, int(pid), data[data.index(b'(') + 1:comm_end])
         
-        self.processes_running.set(process_count['running'])
-        self.processes_blocked.set(process_count['blocked'])
-        self.processes_total.set(process_count['total'])
-        self.threads_total.set(thread_count)
-        
-        # Export top processes (top 5 by CPU and memory)
-        top_cpu_procs.sort(key=lambda x: x['cpu'], reverse=True)
-        top_mem_procs.sort(key=lambda x: x['memory'], reverse=True)
+        self.proc_ticks = current
+        self.proc_scan_time = now
+        top_cpu = [(percent, pid, name.decode(errors='replace')) for percent, pid, name in sorted(top_cpu_procs, reverse=True)]
+        top_mem = [(percent, pid, name.decode(errors='replace')) for percent, pid, name in sorted(top_mem_procs, reverse=True)]
+        return total, (top_cpu, top_mem)
+    
+    def _count_sockets(self):
+        """Count TCP sockets by state and UDP sockets straight from /proc/net"""
+        # psutil.net_connections() also walks every /proc/[pid]/fd to attach
+        # owners, which this collector never used
+        tcp_states = dict.fromkeys(TCP_STATES.values(), 0)
+        for path in ('/proc/net/tcp', '/proc/net/tcp6'):
+            try:
+                lines = _read_proc(path).split(b'\n')[1:]
+            except OSError:
+                continue  # no IPv6
+            for line in lines:
+                fields = line.split(None, 4)
+                if len(fields) > 3 and fields[3] in TCP_STATES:
+                    tcp_states[TCP_STATES[fields[3]]] += 1
         
-        self.top_cpu_processes.info({
-            f"proc_{i}": f"{p['name']}:{p['pid']}:{p['cpu']:.1f}%"
-            for i, p in enumerate(top_cpu_procs[:5])
-        })
-        self.top_mem_processes.info({
-            f"proc_{i}": f"{p['name']}:{p['pid']}:{p['memory']:.1f}%"
-            for i, p in enumerate(top_mem_procs[:5])
-        })
+        udp_count = 0
+        for path in ('/proc/net/udp', '/proc/net/udp6'):
+            try:
+                # One line per socket after the header
+                udp_count += _read_proc(path).count(b'\n') - 1
+            except OSError:
+                continue
+        return tcp_states, udp_count
     
-    def _collect_advanced_system_metrics(self):
+    def _collect_advanced_system_metrics(self, stat):
         """Collect advanced system metrics"""
         try:
             # TCP/UDP connections
-            connections = psutil.net_connections(kind='tcp')
-            tcp_states = defaultdict(int)
-            for conn in connections:
-                tcp_states[conn.status] += 1
-            
+            tcp_states, udp_count = self._count_sockets()
             for state, count in tcp_states.items():
                 self.tcp_connections.labels(state=state).set(count)
+            self.udp_connections.labels(state='active').set(udp_count)
             
-            udp_connections = psutil.net_connections(kind='udp')
-            self.udp_connections.labels(state='active').set(len(udp_connections))
+            kernel = build_families(KERNEL_COUNTER_FAMILIES, None)
             
-            # Context switches and interrupts
-            if os.path.exists('/proc/stat'):
-                with open('/proc/stat', 'r') as f:
-                    for line in f:
-                        if line.startswith('ctxt'):
-                            self.context_switches._value.set(int(line.split()[1]))
-                        elif line.startswith('intr'):
-                            self.interrupts._value.set(int(line.split()[1]))
-                        elif line.startswith('processes'):
-                            self.forks_total._value.set(int(line.split()[1]))
+            # Context switches and interrupts, from the /proc/stat read shared with the CPU metrics
+            for key in (b'ctxt', b'intr', b'processes'):
+                value = _stat_field(stat, key)
+                if value is not None:
+                    kernel[key].add_metric([], value)
+            
+            # file-nr, vmstat and entropy_avail exist on every supported kernel and their
+            # descriptors stay open, so each one costs a single pread per collection
             
             # File descriptors
-            if os.path.exists('/proc/sys/fs/file-nr'):
-                with open('/proc/sys/fs/file-nr', 'r') as f:
-                    parts = f.read().strip().split()
-                    if len(parts) >= 3:
-                        self.fd_allocated.set(int(parts[0]) - int(parts[1]))
-                        self.fd_maximum.set(int(parts[2]))
+            parts = _read_proc('/proc/sys/fs/file-nr', 64).split()
+            if len(parts) >= 3:
+                self.fd_allocated.set(int(parts[0]) - int(parts[1]))
+                self.fd_maximum.set(int(parts[2]))
             
-            # VMStat metrics
-            if os.path.exists('/proc/vmstat'):
-                with open('/proc/vmstat', 'r') as f:
-                    for line in f:
-                        parts = line.strip().split()
-                        if len(parts) == 2:
-                            key, value = parts
-                            if key == 'pgfault':
-                                self.vmstat_pgfault._value.set(int(value))
-                            elif key == 'pgmajfault':
-                                self.vmstat_pgmajfault._value.set(int(value))
-                            elif key == 'pswpin':
-                                self.vmstat_pswpin._value.set(int(value))
-                            elif key == 'pswpout':
-                                self.vmstat_pswpout._value.set(int(value))
+            # VMStat metrics: "name value" pairs, split once and looked up by key
+            fields = iter(_read_proc('/proc/vmstat').split())
+            vmstat = dict(zip(fields, fields))
+            for key in (b'pgfault', b'pgmajfault', b'pswpin', b'pswpout'):
+                value = vmstat.get(key)
+                if value is not None:
+                    kernel[key].add_metric([], int(value))
+            self.kernel_collector.update(kernel.values())
             
             # Entropy
-            if os.path.exists('/proc/sys/kernel/random/entropy_avail'):
-                with open('/proc/sys/kernel/random/entropy_avail', 'r') as f:
-                    self.entropy_available.set(int(f.read().strip()))
+            self.entropy_available.set(int(_read_proc('/proc/sys/kernel/random/entropy_avail', 64)))
             
         except Exception as e:
-            logger.error(f"Error collecting advanced metrics: {e}")
+            logger.error("Error collecting advanced metrics: %s", e)
     
+    @collector('temperature')
     def collect_temperature_metrics(self):
         """Collect temperature sensor metrics"""
         if not self.features['sensors']:
             return
         
-        try:
-            with self.collection_duration.labels(collector='temperature').time():
-                # Try psutil first (more reliable)
-                if hasattr(psutil, 'sensors_temperatures'):
-                    temps = psutil.sensors_temperatures()
-                    for chip, sensors in temps.items():
-                        chip_name = chip.replace('-', '_')
-                        for sensor in sensors:
-                            label = sensor.label or 'unknown'
-                            sensor_name = label.replace(' ', '_').replace('.', '_')
-                            
-                            self.temp_celsius.labels(
-                                chip=chip_name,
-                                sensor=sensor_name,
-                                label=label
-                            ).set(sensor.current)
-                            
-                            if sensor.high and sensor.high > -273:
-                                self.temp_max.labels(
-                                    chip=chip_name,
-                                    sensor=sensor_name,
-                                    label=label
-                                ).set(sensor.high)
-                            
-                            if sensor.critical and sensor.critical > -273:
-                                self.temp_crit.labels(
-                                    chip=chip_name,
-                                    sensor=sensor_name,
-                                    label=label
-                                ).set(sensor.critical)
+        # hwmon temperatures and fans are read from sysfs with the chip layout
+        # cached; psutil re-globs and re-reads every label file on each call, so
+        # it is only asked for temperatures on hosts without hwmon ones (thermal zones)
+        hwmon_temps = self._collect_hwmon_sensors()
+        if not hwmon_temps and hasattr(psutil, 'sensors_temperatures'):
+            cells = self.sensor_cells
+            temps = psutil.sensors_temperatures()
+            for chip, sensors in temps.items():
+                for sensor in sensors:
+                    # Chip and sensor names are fixed per host, so the label
+                    # rewriting and labels() lookups happen once per sensor
+                    key = (chip, sensor.label)
+                    cell = cells.get(key)
+                    if cell is None:
+                        cell = cells[key] = self._temperature_cell(chip, sensor)
+                    temp, high, critical = cell
                     
-                    # Fan speeds
-                    if hasattr(psutil, 'sensors_fans'):
-                        fans = psutil.sensors_fans()
-                        for chip, fan_list in fans.items():
-                            chip_name = chip.replace('-', '_')
-                            for fan in fan_list:
-                                self.fan_rpm.labels(
-                                    chip=chip_name,
-                                    sensor=fan.label or 'unknown'
-                                ).set(fan.current)
-                
-                # Also check hwmon sysfs directly for more sensors
-                self._collect_hwmon_sensors()
-                
-                self.collection_success.labels(collector='temperature').set(1)
-                
-        except Exception as e:
-            logger.error(f"Error collecting temperature metrics: {e}")
-            self.collection_errors.labels(collector='temperature').inc()
-            self.collection_success.labels(collector='temperature').set(0)
+                    temp.set(sensor.current)
+                    if high and sensor.high and sensor.high > -273:
+                        high.set(sensor.high)
+                    if critical and sensor.critical and sensor.critical > -273:
+                        critical.set(sensor.critical)
+    
+    def _temperature_cell(self, chip, sensor):
+        """(current, max, critical) children for a psutil temperature sensor; limits it never reports are None"""
+        label = sensor.label or 'unknown'
+        labels = {
+            'chip': chip.replace('-', '_'),
+            'sensor': label.replace(' ', '_').replace('.', '_'),
+            'label': label,
+        }
+        # Limit series are only created for sensors that report them, as before
+        return (
+            self.temp_celsius.labels(**labels),
+            self.temp_max.labels(**labels) if sensor.high and sensor.high > -273 else None,
+            self.temp_crit.labels(**labels) if sensor.critical and sensor.critical > -273 else None,
+        )
     
     def _collect_hwmon_sensors(self):
-        """Collect additional sensors from hwmon sysfs"""
+        """Collect sensors from hwmon sysfs; returns whether any chip has temperature inputs"""
         try:
-            hwmon_path = '/sys/class/hwmon'
-            if not os.path.exists(hwmon_path):
-                return
-            
-            for hwmon in os.listdir(hwmon_path):
-                hwmon_dir = os.path.join(hwmon_path, hwmon)
-                
-                # Get chip name
-                name_file = os.path.join(hwmon_dir, 'name')
-                if not os.path.exists(name_file):
+            sensors, has_temps = self.cache.get('hwmon_sensors', self._discover_hwmon, ttl=600)
+            for child, path, divisor in sensors:
+                try:
+                    # Inputs are integers, so skip the float parser; one true division scales them
+                    child.set(int(_read_proc(path, 64)) / divisor)
+                except (OSError, ValueError):
+                    pass  # sensor unreadable or gone until the next rescan
+            return has_temps
+        except Exception as e:
+            logger.debug("Error collecting hwmon sensors: %s", e)
+            return False
+    
+    def _discover_hwmon(self):
+        """List hwmon inputs as (gauge child, path, divisor), plus whether any are temperatures"""
+        # The sensor layout only changes with driver loads, so chip names, labels
+        # and the labelled gauge children are resolved here instead of on every collection
+        sensors = []
+        has_temps = False
+        try:
+            with os.scandir('/sys/class/hwmon') as entries:
+                hwmon_dirs = [entry.path for entry in entries]
+        except OSError:
+            return sensors, has_temps
+        
+        for hwmon_dir in hwmon_dirs:
+            # Files are opened relative to the chip directory, so the class
+            # symlink and device path are resolved once per chip, not per file
+            try:
+                dir_fd = os.open(hwmon_dir, os.O_RDONLY | os.O_DIRECTORY)
+            except OSError:
+                continue
+            try:
+                # Get chip name; reading it doubles as the existence check
+                try:
+                    chip_name = _read_small('name', dir_fd=dir_fd).strip().decode()
+                except OSError:
                     continue
-                    
-                with open(name_file, 'r') as f:
-                    chip_name = f.read().strip()
                 
-                # Voltage sensors
-                for voltage_input in glob.glob(os.path.join(hwmon_dir, 'in*_input')):
-                    try:
-                        sensor_num = re.search(r'in(\d+)_input', voltage_input).group(1)
-                        label_file = voltage_input.replace('_input', '_label')
-                        
-                        label = f'in{sensor_num}'
-                        if os.path.exists(label_file):
-                            with open(label_file, 'r') as f:
-                                label = f.read().strip()
-                        
-                        with open(voltage_input, 'r') as f:
-                            voltage = float(f.read().strip()) / 1000.0  # Convert mV to V
-                            self.voltage_volts.labels(chip=chip_name, sensor=label).set(voltage)
-                    except:
-                        pass
-                
-                # Current sensors
-                for current_input in glob.glob(os.path.join(hwmon_dir, 'curr*_input')):
-                    try:
-                        sensor_num = re.search(r'curr(\d+)_input', current_input).group(1)
-                        label_file = current_input.replace('_input', '_label')
-                        
-                        label = f'curr{sensor_num}'
-                        if os.path.exists(label_file):
-                            with open(label_file, 'r') as f:
-                                label = f.read().strip()
-                        
-                        with open(current_input, 'r') as f:
-                            current = float(f.read().strip()) / 1000.0  # Convert mA to A
-                            self.current_amps.labels(chip=chip_name, sensor=label).set(current)
-                    except:
-                        pass
-                
-                # Power sensors
-                for power_input in glob.glob(os.path.join(hwmon_dir, 'power*_input')):
-                    try:
-                        sensor_num = re.search(r'power(\d+)_input', power_input).group(1)
-                        label_file = power_input.replace('_input', '_label')
-                        
-                        label = f'power{sensor_num}'
-                        if os.path.exists(label_file):
-                            with open(label_file, 'r') as f:
-                                label = f.read().strip()
-                        
-                        with open(power_input, 'r') as f:
-                            power = float(f.read().strip()) / 1000000.0  # Convert μW to W
-                            self.power_watts.labels(chip=chip_name, sensor=label).set(power)
-                    except:
-                        pass
-        except Exception as e:
-            logger.debug(f"Error collecting hwmon sensors: {e}")
+                # One listing per chip; inputs are dispatched on their name prefix
+                # and labels are looked up in the same listing
+                with os.scandir(dir_fd) as entries:
+                    files = {entry.name for entry in entries}
+                for file_name in files:
+                    if not file_name.endswith('_input'):
+                        continue
+                    sensor = file_name[:-len('_input')]
+                    kind = sensor.rstrip('0123456789')
+                    if kind == 'temp':
+                        sensors.extend(self._hwmon_temp_cells(hwmon_dir, dir_fd, chip_name, sensor, files))
+                        has_temps = True
+                        continue
+                    if kind == 'fan':
+                        # Labelled as psutil.sensors_fans() did, so the series are unchanged
+                        label = ''
+                        if f'{sensor}_label' in files:
+                            label = _read_small(f'{sensor}_label', dir_fd=dir_fd).strip().decode()
+                        child = self.fan_rpm.labels(chip=chip_name.replace('-', '_'), sensor=label or 'unknown')
+                        sensors.append((child, f'{hwmon_dir}/{file_name}', 1))
+                        continue
+                    sensor_type = HWMON_INPUTS.get(kind)
+                    if sensor_type is None:
+                        continue
+                    
+                    label = sensor
+                    if f'{sensor}_label' in files:
+                        label = _read_small(f'{sensor}_label', dir_fd=dir_fd).strip().decode()
+                    
+                    gauge = getattr(self, sensor_type[0])
+                    sensors.append((gauge.labels(chip=chip_name, sensor=label), f'{hwmon_dir}/{file_name}', sensor_type[1]))
+            finally:
+                os.close(dir_fd)
+        return sensors, has_temps
+    
+    def _hwmon_temp_cells(self, hwmon_dir, dir_fd, chip_name, sensor, files):
+        """(gauge child, path, divisor) for one hwmon temperature's input and limit files"""
+        # Labelled as psutil.sensors_temperatures() did, so the series are unchanged
+        label = ''
+        if f'{sensor}_label' in files:
+            label = _read_small(f'{sensor}_label', dir_fd=dir_fd).strip().decode()
+        label = label or 'unknown'
+        labels = {
+            'chip': chip_name.replace('-', '_'),
+            'sensor': label.replace(' ', '_').replace('.', '_'),
+            'label': label,
+        }
+        cells = []
+        for suffix, attr in HWMON_TEMP_FIELDS.items():
+            file_name = sensor + suffix
+            if file_name not in files:
+                continue
+            if suffix != '_input':
+                # Limits are only exported when the driver reports a real one, as before
+                try:
+                    limit = int(_read_small(file_name, dir_fd=dir_fd))
+                except (OSError, ValueError):
+                    continue
+                if not limit or limit <= -273000:
+                    continue
+            cells.append((getattr(self, attr).labels(**labels), f'{hwmon_dir}/{file_name}', 1000))
+        return cells
+    
+    @collector('gpu')
+    def collect_gpu_metrics(self):
+        """Collect GPU metrics"""
+        if self.features['nvidia_gpu']:
+            self._collect_nvidia_gpu_metrics()
+        if self.features['amd_gpu']:
+            self._collect_amd_gpu_metrics()
+    
+    def _collect_nvidia_gpu_metrics(self):
+        """Collect NVIDIA GPU metrics through NVML, without starting nvidia-smi"""
+        if self.nvml_handles is None:
+            self._collect_nvidia_smi_metrics()
+            return
+        
+        self.gpu_count.labels(vendor='nvidia').set(len(self.nvml_handles))
+        for handle, gpu, name in self.nvml_handles:
+            labels = (gpu, name, 'nvidia')
+            
+            temp = _nvml_query(pynvml.nvmlDeviceGetTemperature, handle, pynvml.NVML_TEMPERATURE_GPU)
+            if temp is not None:
+                self._gpu_cell('gpu_temp', labels).set(temp)
+            
+            rates = _nvml_query(pynvml.nvmlDeviceGetUtilizationRates, handle)
+            if rates is not None:
+                self._gpu_cell('gpu_utilization', labels, 'gpu').set(rates.gpu)
+                self._gpu_cell('gpu_utilization', labels, 'memory').set(rates.memory)
+            
+            memory = _nvml_query(pynvml.nvmlDeviceGetMemoryInfo, handle)
+            if memory is not None:
+                self._gpu_cell('gpu_memory_total', labels).set(memory.total)
+                self._gpu_cell('gpu_memory_used', labels).set(memory.used)
+                self._gpu_cell('gpu_memory_free', labels).set(memory.free)
+            
+            # NVML reports power in milliwatts and clocks in MHz
+            power = _nvml_query(pynvml.nvmlDeviceGetPowerUsage, handle)
+            if power is not None:
+                self._gpu_cell('gpu_power_draw', labels).set(power / 1000)
+            power_limit = _nvml_query(pynvml.nvmlDeviceGetEnforcedPowerLimit, handle)
+            if power_limit is not None:
+                self._gpu_cell('gpu_power_limit', labels).set(power_limit / 1000)
+            
+            clock = _nvml_query(pynvml.nvmlDeviceGetClockInfo, handle, pynvml.NVML_CLOCK_GRAPHICS)
+            if clock is not None:
+                self._gpu_cell('gpu_clock_graphics', labels).set(clock * 1000000)
+            clock = _nvml_query(pynvml.nvmlDeviceGetClockInfo, handle, pynvml.NVML_CLOCK_MEM)
+            if clock is not None:
+                self._gpu_cell('gpu_clock_memory', labels).set(clock * 1000000)
+            
+            # Passively cooled cards have no fan to report
+            fan = _nvml_query(pynvml.nvmlDeviceGetFanSpeed, handle)
+            if fan is not None:
+                self._gpu_cell('gpu_fan_speed', labels).set(fan)
+            
+            link_gen = _nvml_query(pynvml.nvmlDeviceGetCurrPcieLinkGeneration, handle)
+            if link_gen is not None:
+                self._gpu_cell('gpu_pcie_link_gen', labels).set(link_gen)
+            link_width = _nvml_query(pynvml.nvmlDeviceGetCurrPcieLinkWidth, handle)
+            if link_width is not None:
+                self._gpu_cell('gpu_pcie_link_width', labels).set(link_width)
+            
+            reasons = _nvml_query(pynvml.nvmlDeviceGetCurrentClocksThrottleReasons, handle)
+            if reasons is not None:
+                for reason, mask in NVML_THROTTLE_REASONS.items():
+                    self._gpu_cell('gpu_throttle_reason', labels, reason).set(1 if reasons & mask else 0)
+    
+    def _collect_nvidia_smi_metrics(self):
+        """Collect NVIDIA GPU metrics from the latest persistent nvidia-smi sample"""
+        count = 0
+        for values in self.nvidia_smi.latest():
+            if len(values) != len(NVIDIA_SMI_FIELDS) + 2:
+                continue
+            count += 1
+            labels = (values[0], values[1], 'nvidia')
+            for (_, attr, kind, scale), value in zip(NVIDIA_SMI_FIELDS, values[2:]):
+                reading = _fnum(value)
+                if reading is not None:
+                    self._gpu_cell(attr, labels, kind).set(reading * scale)
+        self.gpu_count.labels(vendor='nvidia').set(count)
     
+    def _gpu_cell(self, attr, labels, kind=None):
+        """Gauge child for a GPU metric, resolved once per GPU, metric and type label"""
+        key = (attr, kind, labels)
+        cell = self.gpu_cells.get(key)
+        if cell is None:
+            gauge = getattr(self, attr)
+            cell = self.gpu_cells[key] = gauge.labels(*labels, kind) if kind else gauge.labels(*labels)
+        return cell
+    
+    def _collect_amd_gpu_metrics(self):
+        """Collect AMD GPU metrics from amdgpu sysfs files"""
+        cards = self.cache.get('amd_gpus', self._discover_amd_gpus, ttl=600)
+        self.gpu_count.labels(vendor='amd').set(len(cards))
+        for readings in cards:
+            for child, path, scale in readings:
+                try:
+                    child.set(int(_read_proc(path, 64)) * scale)
+                except (OSError, ValueError):
+                    pass  # attribute unsupported by this card or card gone until the next rescan
+    
+    def _discover_amd_gpus(self):
+        """List (gauge child, path, scale) readings per amdgpu card"""
+        # Cards, their hwmon directory and the labelled gauge children only change
+        # with hotplug, so sysfs is walked here rather than on every collection
+        cards = []
+        for card, device in self.cache.get('drm_cards', _scan_drm, ttl=600).get(b'0x1002', ()):
+            try:
+                files = set(os.listdir(device))
+            except OSError:
+                continue
+            try:
+                name = _read_small(f'{device}/product_name', 128).strip().decode()
+            except OSError:
+                name = ''
+            if not name:
+                try:
+                    name = 'AMD ' + _read_small(f'{device}/device', 8).strip().decode()
+                except OSError:
+                    name = 'AMD'
+            
+            hwmon_dir = None
+            if 'hwmon' in files:
+                try:
+                    with os.scandir(f'{device}/hwmon') as entries:
+                        hwmon_dir = next((entry.path for entry in entries), None)
+                    if hwmon_dir:
+                        files.update('hwmon/' + file_name for file_name in os.listdir(hwmon_dir))
+                except OSError:
+                    pass
+            
+            labels = (card[len('card'):], name, 'amd')
+            readings = []
+            bound = set()
+            for file_name, attr, kind, scale in AMD_SYSFS_FIELDS:
+                if file_name not in files or (attr, kind) in bound:
+                    continue
+                bound.add((attr, kind))
+                gauge = getattr(self, attr)
+                child = gauge.labels(*labels, kind) if kind else gauge.labels(*labels)
+                path = f'{hwmon_dir}/{file_name[len("hwmon/"):]}' if file_name.startswith('hwmon/') else f'{device}/{file_name}'
+                readings.append((child, path, scale))
+            cards.append(readings)
+        return cards
+    
+    @collector('systemd')
     def collect_systemd_metrics(self):
         """Collect systemd service metrics"""
         if not self.features['systemd']:
             return
         
-        try:
-            with self.collection_duration.labels(collector='systemd').time():
-                # Get overall system state
-                result = subprocess.run(['systemctl', 'is-system-running'],
-                                      capture_output=True, text=True, timeout=5)
-                system_running = 1 if result.stdout.strip() == 'running' else 0
-                self.systemd_system_running.set(system_running)
-                
-                # List all units
-                result = subprocess.run(['systemctl', 'list-units', '--all', '--no-legend', '--no-pager'],
-                                      capture_output=True, text=True, timeout=10)
-                
-                if result.returncode == 0:
-                    unit_states = defaultdict(int)
-                    
-                    for line in result.stdout.strip().split('\n'):
-                        if not line:
-                            continue
-                        
-                        parts = line.split(None, 4)
-                        if len(parts) >= 4:
-                            unit_name = parts[0]
-                            load_state = parts[1]
-                            active_state = parts[2]
-                            sub_state = parts[3]
-                            
-                            # Count by state
-                            unit_states[active_state] += 1
-                            
-                            # Track important services
-                            if unit_name.endswith('.service'):
-                                # Set state (1 = active, 0 = inactive)
-                                state_value = 1 if active_state == 'active' else 0
-                                self.systemd_units.labels(
-                                    name=unit_name,
-                                    state=active_state,
-                                    type='service'
-                                ).set(state_value)
-                    
-                    # Set total counts by state
-                    for state, count in unit_states.items():
-                        self.systemd_units_total.labels(state=state).set(count)
-                
-                # Get failed units specifically
-                result = subprocess.run(['systemctl', 'list-units', '--failed', '--no-legend', '--no-pager'],
-                                      capture_output=True, text=True, timeout=5)
-                if result.returncode == 0:
-                    failed_count = len(result.stdout.strip().split('\n')) if result.stdout.strip() else 0
-                    self.systemd_units_total.labels(state='failed').set(failed_count)
-                
-                self.collection_success.labels(collector='systemd').set(1)
-                
-        except Exception as e:
-            logger.error(f"Error collecting systemd metrics: {e}")
-            self.collection_errors.labels(collector='systemd').inc()
-            self.collection_success.labels(collector='systemd').set(0)
+        system_state, units = self._list_systemd_units()
+        system_running = 1 if system_state == 'running' else 0
+        self.systemd_system_running.set(system_running)
+        
+        if units is not None:
+            # Count by state
+            unit_states = StateCounter(unit[2] for unit in units)
+            
+            # Unit states are gathered into a family and published in one
+            # swap, so a unit changing state also drops its old series
+            families = build_families(SYSTEMD_FAMILIES, ['name', 'state', 'type'])
+            units_family = families['units']
+            
+            for unit_name, load_state, active_state, sub_state in units:
+                # Track important services
+                if unit_name.endswith('.service'):
+                    # Set state (1 = active, 0 = inactive)
+                    state_value = 1 if active_state == 'active' else 0
+                    units_family.add_metric((unit_name, active_state, 'service'), state_value)
+            
+            self.systemd_collector.update(families.values())
+            
+            # Set total counts by state; failed is always exported, even at 0
+            unit_states.setdefault('failed', 0)
+            for state, count in unit_states.items():
+                self.systemd_units_total.labels(state=state).set(count)
+    
+    def _list_systemd_units(self):
+        """System state and (name, load, active, sub) per unit; units is None if unavailable"""
+        if open_dbus_connection is not None:
+            try:
+                return self._list_systemd_units_dbus()
+            except Exception as e:
+                logger.debug("systemd D-Bus query failed, using systemctl: %s", e)
+                if self.systemd_bus is not None:
+                    self.systemd_bus.close()
+                    self.systemd_bus = None
+        
+        # Get overall system state
+        result = subprocess.run(['systemctl', 'is-system-running'],
+                              timeout=5, **_RUN_KW)
+        system_state = result.stdout.strip()
+        
+        # List all units
+        result = subprocess.run(['systemctl', 'list-units', '--all', '--plain', '--no-legend', '--no-pager'],
+                              timeout=10, **_RUN_KW)
+        if result.returncode != 0:
+            return system_state, None
+        
+        units = []
+        for line in result.stdout.strip().split('\n'):
+            parts = line.split(None, 4)
+            if len(parts) >= 4:
+                units.append(tuple(parts[:4]))
+        return system_state, units
+    
+    def _list_systemd_units_dbus(self):
+        """_list_systemd_units through the systemd Manager D-Bus interface"""
+        # One ListUnits call returns typed unit records, with no process to spawn
+        if self.systemd_bus is None:
+            self.systemd_bus = open_dbus_connection(bus='SYSTEM')
+        manager = DBusAddress('/org/freedesktop/systemd1', bus_name='org.freedesktop.systemd1',
+                              interface='org.freedesktop.systemd1.Manager')
+        
+        reply = self.systemd_bus.send_and_get_reply(Properties(manager).get('SystemState'), timeout=5)
+        system_state = unwrap_msg(reply)[0][1]
+        
+        reply = self.systemd_bus.send_and_get_reply(new_method_call(manager, 'ListUnits'), timeout=10)
+        units = [(unit[0], unit[2], unit[3], unit[4]) for unit in unwrap_msg(reply)[0]]
+        return system_state, units
     
+    @collector('mdadm')
     def collect_mdadm_metrics(self):
         """Collect mdadm RAID metrics"""
         if not self.features['mdadm']:
             return
         
+        arrays, syncs = _parse_mdstat(_read_proc('/proc/mdstat'))
+        
+        for array, state, total_disks, active_disks in arrays:
+            device = f'/dev/{array}'
+            self.mdadm_array_state.labels(device=device, state=state).set(1 if state == 'active' else 0)
+            self.mdadm_disks_total.labels(device=device).set(total_disks)
+            self.mdadm_disks_active.labels(device=device).set(active_disks)
+            self.mdadm_disks_failed.labels(device=device).set(total_disks - active_disks)
+        
+        for array, (percent, speed) in syncs.items():
+            device = f'/dev/{array}'
+            if percent is not None:
+                self.mdadm_sync_completed.labels(device=device).set(percent)
+            if speed is not None:
+                self.mdadm_sync_speed.labels(device=device).set(speed)
+    
+    @collector('smart')
+    def collect_smart_metrics(self):
+        """Collect SMART health and attributes for physical disks"""
+        if not self.features['smart_monitoring']:
+            return
+        
+        devices = self.cache.get('smart_devices', self._find_smart_devices, ttl=3600)
+        
+        # smartctl mostly waits on the drive, so devices are queried side
+        # by side; each result is then reused for SMART_CACHE_TTL
+        results = self.smart_pool.run_all([partial(self._read_smart, device) for device in devices], timeout=30)
+        
+        counters = build_families(SMART_COUNTER_FAMILIES, ['device', 'model'])
+        for device, result in zip(devices, results):
+            if result is None or not result[0] or result[1] is None:
+                continue
+            self._set_smart_metrics(f'/dev/{device}', result[1], counters)
+        self.smart_collector.update(counters.values())
+    
+    def _find_smart_devices(self):
+        """List block devices backed by real hardware (those with a device link in sysfs)"""
+        devices = []
+        with os.scandir('/sys/block') as entries:
+            for entry in entries:
+                if entry.name.startswith(('loop', 'ram', 'zram', 'sr', 'fd')):
+                    continue
+                if os.path.exists(f'{entry.path}/device'):
+                    devices.append(entry.name)
+        return sorted(devices)
+    
+    def _read_smart(self, device):
+        """smartctl JSON report for a device, cached for SMART_CACHE_TTL"""
+        # NVMe drives hand out their health log over an ioctl, so smartctl is
+        # only started for them if the ioctl is refused
+        if device.startswith('nvme'):
+            report = self.cache.get(f'nvme:{device}', partial(self._read_nvme_smart_log, device), ttl=SMART_CACHE_TTL)
+            if report is not None:
+                return report
+        return self.cache.get(f'smart:{device}', partial(self._run_smartctl, device), ttl=SMART_CACHE_TTL)
+    
+    def _read_nvme_smart_log(self, device):
+        """NVMe SMART / Health log shaped like smartctl's JSON report; None if the ioctl fails"""
+        log = ctypes.create_string_buffer(512)
+        command = bytearray(NVME_SMART_LOG_CMD)
+        # The data pointer (offset 24) must point at our buffer
+        struct.pack_into('=Q', command, 24, ctypes.addressof(log))
         try:
-            with self.collection_duration.labels(collector='mdadm').time():
-                # Parse /proc/mdstat
-                with open('/proc/mdstat', 'r') as f:
-                    content = f.read()
+            fd = os.open(f'/dev/{device}', os.O_RDONLY)
+            try:
+                fcntl.ioctl(fd, NVME_IOCTL_ADMIN_CMD, command)
+            finally:
+                os.close(fd)
+        except OSError as e:
+            logger.debug("NVMe SMART log ioctl failed for %s, using smartctl: %s", device, e)
+            return None
+        return _parse_nvme_smart_log(log.raw, device)
+    
+    def _run_smartctl(self, device):
+        """Run smartctl for one device; None if the device can't be queried"""
+        result = subprocess.run(['smartctl', '-a', '-j', f'/dev/{device}'],
+                              timeout=30, **_RUN_KW)
+        # Bits 0-1 of the exit status mean the command or device open failed;
+        # the higher bits report disk problems and still come with a full report
+        if result.returncode & 3:
+            return None
+        return json_loads(result.stdout)
+    
+    def _set_smart_metrics(self, device, data, counters):
+        """Set SMART metrics for one device from its smartctl JSON report"""
+        model = data.get('model_name') or data.get('scsi_model_name') or 'unknown'
+        labels = (device, model)
+        
+        status = data.get('smart_status')
+        if status is not None:
+            self.smart_healthy.labels(device, model, data.get('serial_number', 'unknown')).set(1 if status.get('passed') else 0)
+        
+        temperature = data.get('temperature', {}).get('current')
+        if temperature is not None:
+            self.smart_temperature.labels(*labels).set(temperature)
+        
+        power_on_hours = data.get('power_on_time', {}).get('hours')
+        if power_on_hours is not None:
+            counters['power_on_hours'].add_metric(labels, power_on_hours)
+        power_cycles = data.get('power_cycle_count')
+        if power_cycles is not None:
+            counters['power_cycles'].add_metric(labels, power_cycles)
+        
+        # ATA drives report numbered attributes; NVMe drives a health log
+        for attribute in data.get('ata_smart_attributes', {}).get('table', []):
+            attribute_id = attribute.get('id')
+            if attribute_id in SMART_ATTRIBUTES:
+                getattr(self, SMART_ATTRIBUTES[attribute_id]).labels(*labels).set(attribute['raw']['value'])
+            elif attribute_id in SMART_WEAR_ATTRIBUTES:
+                self.smart_ssd_wearout.labels(*labels).set(100 - attribute['value'])
+        
+        nvme_health = data.get('nvme_smart_health_information_log')
+        if nvme_health:
+            self.smart_ssd_wearout.labels(*labels).set(nvme_health.get('percentage_used', 0))
+            self.smart_uncorrectable_sectors.labels(*labels).set(nvme_health.get('media_errors', 0))
+    
+    @collector('ipmi')
+    def collect_ipmi_metrics(self):
+        """Collect IPMI sensor readings from the BMC"""
+        if not self.features['ipmi']:
+            return
+        
+        # One sensor listing returns every sensor; readings are fanned out to the
+        # typed gauges from that single output. The listing comes from the
+        # persistent shell session, or a one-off ipmitool run where there is none
+        output = self.ipmi_shell.query('sensor')
+        if output is None:
+            result = subprocess.run(['ipmitool', 'sensor'],
+                                  timeout=10, **_RUN_KW)
+            output = result.stdout if result.returncode == 0 else None
+        
+        if output is not None:
+            # One regex scan picks out the numeric rows; 'na' readings and
+            # discrete sensors (0x.. values) never match
+            for name, value, unit, state in _RE_IPMI_READING.findall(output):
+                reading = float(value)
+                sensor_type = IPMI_UNIT_TYPES.get(unit, 'other')
+                self.ipmi_sensor_value.labels(name=name, type=sensor_type, unit=unit).set(reading)
                 
-                current_array = None
-                for line in content.split('\n'):
-                    # Array definition line
-                    if line.startswith('md'):
-                        parts = line.split()
-                        if len(parts) >= 4:
-                            current_array = parts[0]
-                            state = parts[2]
-                            
-                            # Count disks
-                            total_disks = 0
-                            active_disks = 0
-                            
-                            # Parse disk configuration
-                            for part in parts[3:]:
-                                if '[' in part and ']' in part:
-                                    # Format: sda1[0] or sda1[0](F) for failed
-                                    total_disks += 1
-                                    if '(F)' not in part:
-                                        active_disks += 1
-                            
-                            self.mdadm_array_state.labels(
-                                device=f'/dev/{current_array}',
-                                state=state
-                            ).set(1 if state == 'active' else 0)
-                            
-                            self.mdadm_disks_total.labels(device=f'/dev/{current_array}').set(total_disks)
-                            self.mdadm_disks_active.labels(device=f'/dev/{current_array}').set(active_disks)
-                            self.mdadm_disks_failed.labels(device=f'/dev/{current_array}').set(
-                                total_disks - active_disks
-                            )
-                    
-                    # Sync status line
-                    elif current_array and 'recovery' in line or 'resync' in line or 'reshape' in line:
-                        # Parse sync percentage
-                        match = re.search(r'(\d+\.\d+)%', line)
-                        if match:
-                            percent = float(match.group(1))
-                            self.mdadm_sync_completed.labels(device=f'/dev/{current_array}').set(percent)
-                        
-                        # Parse sync speed
-                        match = re.search(r'speed=(\d+)K/sec', line)
-                        if match:
-                            speed = int(match.group(1))
-                            self.mdadm_sync_speed.labels(device=f'/dev/{current_array}').set(speed)
+                previous = self.ipmi_states.get(name)
+                if previous != (sensor_type, state):
+                    if previous:
+                        self.ipmi_sensor_state.remove(name, *previous)
+                    self.ipmi_sensor_state.labels(name=name, type=sensor_type, state=state).set(1)
+                    self.ipmi_states[name] = (sensor_type, state)
                 
-                self.collection_success.labels(collector='mdadm').set(1)
+                if sensor_type == 'temperature':
+                    self.ipmi_temperature.labels(name=name, location='').set(reading)
+                elif sensor_type == 'fan':
+                    self.ipmi_fan_speed.labels(name=name).set(reading)
+                elif sensor_type == 'voltage':
+                    self.ipmi_voltage.labels(name=name, rail=name).set(reading)
+                elif sensor_type == 'power':
+                    self.ipmi_power.labels(name=name).set(reading)
+    
+    @collector('zfs')
+    def collect_zfs_metrics(self):
+        """Collect ZFS ARC, L2ARC and pool metrics"""
+        families = []
+        # One regex scan turns the ~100 arcstats rows into a dict; only the
+        # handful of fields exported are then looked up
+        try:
+            arcstats = dict(_RE_ARCSTATS.findall(_read_proc('/proc/spl/kstat/zfs/arcstats')))
+        except OSError:
+            arcstats = None  # zfs module not loaded
+        if arcstats is not None:
+            families.extend(self._arc_families(arcstats))
+        
+        # Capacity comes from a pool listing cached for a minute, as it moves
+        # slowly; health is re-read every collection from the pool's kstat,
+        # which needs no zpool process
+        pools = build_families(ZPOOL_FAMILIES, ['pool'])
+        for name, health, *values in self.cache.get('zpools', self._list_zpools, ttl=60):
+            try:
+                health = _read_small(f'/proc/spl/kstat/zfs/{name}/state', 32).strip().decode()
+            except OSError:
+                pass  # OpenZFS before 2.0 has no state kstat; keep the listed health
+            pools['health'].add_metric([name], ZPOOL_HEALTH.get(health, 2))
+            for family, value in zip(ZPOOL_FAMILIES[1:], values):
+                # Percentages and ratios come with a % or x suffix; '-' means not applicable
+                reading = _fnum(value.rstrip('%x'))
+                if reading is not None:
+                    pools[family[0]].add_metric([name], reading)
+        families.extend(pools.values())
+        self.zfs_collector.update(families)
+    
+    def _arc_families(self, arcstats):
+        """Set the ARC gauges and return the ARC counter families from parsed arcstats"""
+        for key, attr in ZFS_ARC_GAUGES.items():
+            value = arcstats.get(key)
+            if value is not None:
+                getattr(self, attr).set(int(value))
+        
+        hits = int(arcstats.get(b'hits', 0))
+        misses = int(arcstats.get(b'misses', 0))
+        if hits + misses:
+            self.zfs_arc_hit_ratio.set(hits / (hits + misses))
+        
+        families = build_families(ZFS_ARC_COUNTER_FAMILIES, None)
+        for key, family in families.items():
+            value = arcstats.get(key)
+            if value is not None:
+                family.add_metric([], int(value))
+        evicted = CounterMetricFamily('node_zfs_arc_evicted_bytes_total', 'ZFS ARC evicted bytes', labels=['type'])
+        for key, evict_type in ZFS_ARC_EVICT_TYPES.items():
+            value = arcstats.get(key)
+            if value is not None:
+                evicted.add_metric([evict_type], int(value))
+        return [*families.values(), evicted]
+    
+    def _list_zpools(self):
+        """(name, health, size, allocated, free, fragmentation, dedupratio) per imported pool"""
+        try:
+            result = subprocess.run(
+                ['zpool', 'list', '-Hp', '-o', 'name,health,' + ','.join(key for key, _, _, _ in ZPOOL_FAMILIES[1:])],
+                timeout=10, **_RUN_KW)
+        except FileNotFoundError:
+            return []  # kernel module only, no userland tools
+        if result.returncode != 0:
+            return []
+        return [fields for fields in (line.split('\t') for line in result.stdout.splitlines())
+                if len(fields) == len(ZPOOL_FAMILIES) + 1]
+    
+    @collector('vms')
+    def collect_vm_metrics(self):
+        """Collect Proxmox VM and container state from guest configs and runtime files"""
+        # The roster comes from the cluster filesystem and running state from
+        # pid files and cgroups, so no qm/pct list process is started
+        families = build_families(VM_FAMILIES, ['vmid', 'name', 'type'])
+        now = time.time()
+        seen = set()
+        for feature, guest_type, config_dir, name_key in PVE_GUEST_TYPES:
+            if not self.features[feature]:
+                continue
+            try:
+                with os.scandir(config_dir) as entries:
+                    configs = [entry for entry in entries if entry.name.endswith('.conf')]
+            except OSError:
+                continue
+            
+            counts = {'running': 0, 'stopped': 0}
+            seen.update(entry.path for entry in configs)
+            for entry in configs:
+                vmid = entry.name[:-len('.conf')]
+                try:
+                    name, memory = self._guest_config(entry, name_key)
+                except OSError:
+                    continue  # removed since the listing
+                labels = [vmid, name, guest_type]
                 
-        except Exception as e:
-            logger.error(f"Error collecting mdadm metrics: {e}")
-            self.collection_errors.labels(collector='mdadm').inc()
-            self.collection_success.labels(collector='mdadm').set(0)
+                if guest_type == 'qemu':
+                    started = self._qemu_start_time(vmid)
+                    running = started is not None
+                    cgroup = f'{GUEST_CGROUP_ROOT}/qemu.slice/{vmid}.scope'
+                else:
+                    # lxc creates the container's cgroup on start and removes it on stop
+                    started = None
+                    cgroup = f'{GUEST_CGROUP_ROOT}/lxc/{vmid}'
+                    running = os.path.isdir(cgroup)
+                
+                counts['running' if running else 'stopped'] += 1
+                families['status'].add_metric(labels, 1 if running else 0)
+                families['memory_total'].add_metric(labels, memory)
+                if not running:
+                    continue
+                if started is not None:
+                    families['uptime'].add_metric(labels, now - started)
+                # Opened per read rather than kept open: guests come and go, and a
+                # descriptor cached per guest would outlive it
+                try:
+                    families['memory_used'].add_metric(labels, int(_read_small(f'{cgroup}/{GUEST_MEMORY_FILE}', 32)))
+                except (OSError, ValueError):
+                    pass  # the guest stopped meanwhile
+            
+            for status, count in counts.items():
+                self.vm_count.labels(type=guest_type, status=status).set(count)
+        self.vm_collector.update(families.values())
+        
+        # Forget the configs of destroyed guests
+        for path in self.guest_configs.keys() - seen:
+            del self.guest_configs[path]
+    
+    def _guest_config(self, entry, name_key):
+        """(name, memory bytes) from a guest config, parsed again only when it changes"""
+        mtime = entry.stat().st_mtime_ns
+        cached = self.guest_configs.get(entry.path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1:]
+        
+        name = ''
+        memory = 512  # MiB, the Proxmox default when the config has no memory line
+        with open(entry.path, encoding='utf-8', errors='replace') as f:
+            for line in f:
+                if line.startswith('['):
+                    break  # snapshot sections follow the current config
+                key, _, value = line.partition(':')
+                if key == name_key:
+                    name = value.strip()
+                elif key == 'memory':
+                    # qemu may write 'memory: current=4096'
+                    try:
+                        memory = int(value.strip().split(',')[0].split('=')[-1])
+                    except ValueError:
+                        pass
+        self.guest_configs[entry.path] = (mtime, name, memory << 20)
+        return name, memory << 20
+    
+    def _qemu_start_time(self, vmid):
+        """Start time of a running VM from its pid file, or None if it is not running"""
+        pid_file = f'/run/qemu-server/{vmid}.pid'
+        try:
+            pid = int(_read_small(pid_file, 32))
+            # A pid file left by a crashed VM points at a process that is gone
+            if not os.path.exists(f'/proc/{pid}'):
+                return None
+            return os.stat(pid_file).st_mtime
+        except (OSError, ValueError):
+            return None
     
     def collect_container_metrics(self):
         """Collect Docker/Podman container metrics"""
+        # (name, id, runtime, cpu_percent, memory_bytes, limit_bytes) per running container
+        container_stats = []
+        ok = True
         if self.features['docker']:
-            self._collect_docker_metrics()
+            ok = self._collect_docker_metrics(container_stats) and ok
         if self.features['podman']:
-            self._collect_podman_metrics()
+            ok = self._collect_podman_metrics(container_stats) and ok
+        # A partial list would drop every series of the failed runtime; keep the
+        # last complete snapshot exposed instead. The failure is already logged
+        # and counted by the runtime's own collector
+        if ok:
+            self._publish_container_stats(container_stats)
+    
+    def _publish_container_stats(self, container_stats):
+        """Expose per-container usage, folding containers past MAX_CONTAINER_SERIES into __other__"""
+        families = build_families(CONTAINER_FAMILIES, ['name', 'id', 'runtime'])
+        other = {}
+        for i, (name, container_id, runtime, cpu, memory, limit) in enumerate(container_stats):
+            if i >= MAX_CONTAINER_SERIES:
+                totals = other.setdefault(runtime, [0, 0, 0])
+                totals[0] += cpu
+                totals[1] += memory or 0
+                totals[2] += limit or 0
+                continue
+            labels = [name, container_id, runtime]
+            families['cpu'].add_metric(labels, cpu)
+            if memory is not None:
+                families['memory'].add_metric(labels, memory)
+                families['memory_limit'].add_metric(labels, limit)
+        
+        for runtime, (cpu, memory, limit) in other.items():
+            labels = ['__other__', '__other__', runtime]
+            families['cpu'].add_metric(labels, cpu)
+            families['memory'].add_metric(labels, memory)
+            families['memory_limit'].add_metric(labels, limit)
+        if other:
+            self.cardinality_overflow.labels(metric='container').inc(len(container_stats) - MAX_CONTAINER_SERIES)
+        self.container_collector.update(families.values())
     
-    def _collect_docker_metrics(self):
+    @collector('docker')
+    def _collect_docker_metrics(self, container_stats):
         """Collect Docker container metrics"""
+        # Talk to the Engine API directly instead of spawning the docker CLI,
+        # which itself makes the same API calls after a fork/exec
+        containers = _unix_get_json(DOCKER_SOCKET, '/containers/json?all=true')
+        container_states = StateCounter(container.get('State', 'unknown') for container in containers)
+        stats_jobs = []
+        
+        for container in containers:
+            # Get container stats if running
+            if container.get('State') == 'running':
+                names = container.get('Names') or ['/unknown']
+                stats_jobs.append(partial(self._collect_docker_stats, container['Id'][:12], names[0].lstrip('/')))
+        
+        self._gather_container_stats(stats_jobs, container_stats)
+        
+        # Set container counts
+        for state, count in container_states.items():
+            self.container_count.labels(runtime='docker', state=state).set(count)
+    
+    def _gather_container_stats(self, stats_jobs, container_stats):
+        """Run per-container stats calls side by side, keeping the ones that returned"""
+        # Each call mostly waits on the daemon (docker samples CPU for about a
+        # second), so running them together bounds the wait by the slowest one
+        for result in self.container_pool.run_all(stats_jobs, timeout=15):
+            if result is not None and result[0] and result[1] is not None:
+                container_stats.append(result[1])
+    
+    def _collect_docker_stats(self, container_id, container_name):
+        """One Docker container's usage from the Engine stats endpoint, or None"""
         try:
-            with self.collection_duration.labels(collector='docker').time():
-                # Get container list
-                result = subprocess.run(['docker', 'ps', '-a', '--format', 
-                                       '{{.ID}}\t{{.Names}}\t{{.Status}}\t{{.State}}'],
-                                      capture_output=True, text=True, timeout=5)
-                
-                if result.returncode == 0:
-                    container_states = defaultdict(int)
-                    
-                    for line in result.stdout.strip().split('\n'):
-                        if not line:
-                            continue
-                        
-                        parts = line.split('\t')
-                        if len(parts) >= 4:
-                            container_id = parts[0][:12]
-                            container_name = parts[1]
-                            status = parts[2]
-                            state = parts[3]
-                            
-                            container_states[state] += 1
-                            
-                            # Get container stats if running
-                            if 'running' in state.lower():
-                                self._collect_container_stats(container_id, container_name, 'docker')
-                    
-                    # Set container counts
-                    for state, count in container_states.items():
-                        self.container_count.labels(runtime='docker', state=state).set(count)
-                
-                self.collection_success.labels(collector='docker').set(1)
-                
-        except Exception as e:
-            logger.error(f"Error collecting Docker metrics: {e}")
-            self.collection_errors.labels(collector='docker').inc()
-            self.collection_success.labels(collector='docker').set(0)
+            stats = _unix_get_json(DOCKER_SOCKET, f'/containers/{container_id}/stats?stream=false', timeout=10)
+        except (OSError, ValueError):
+            return None  # container stopped between listing and stats
+        
+        # Same computation as `docker stats`: usage delta over host CPU time delta,
+        # scaled by the CPUs online, between the two samples the daemon returns
+        cpu = stats.get('cpu_stats', {})
+        precpu = stats.get('precpu_stats', {})
+        cpu_percent = 0.0
+        cpu_delta = cpu.get('cpu_usage', {}).get('total_usage', 0) - precpu.get('cpu_usage', {}).get('total_usage', 0)
+        system_delta = cpu.get('system_cpu_usage', 0) - precpu.get('system_cpu_usage', 0)
+        if cpu_delta > 0 and system_delta > 0:
+            online_cpus = cpu.get('online_cpus') or len(cpu.get('cpu_usage', {}).get('percpu_usage') or ()) or 1
+            cpu_percent = cpu_delta / system_delta * online_cpus * 100
+        
+        # Memory excludes reclaimable page cache, as `docker stats` reports it
+        used_bytes = limit_bytes = None
+        memory = stats.get('memory_stats', {})
+        if 'usage' in memory:
+            memory_detail = memory.get('stats', {})
+            cache = memory_detail.get('total_inactive_file', memory_detail.get('inactive_file', 0))
+            used_bytes = max(memory['usage'] - cache, 0)
+            limit_bytes = memory.get('limit', 0)
+        
+        return container_name, container_id, 'docker', cpu_percent, used_bytes, limit_bytes
     
-    def _collect_podman_metrics(self):
+    @collector('podman')
+    def _collect_podman_metrics(self, container_stats):
         """Collect Podman container metrics"""
-        try:
-            with self.collection_duration.labels(collector='podman').time():
-                # Similar to Docker but using podman commands
-                result = subprocess.run(['podman', 'ps', '-a', '--format', 'json'],
-                                      capture_output=True, text=True, timeout=5)
-                
-                if result.returncode == 0:
-                    containers = json.loads(result.stdout)
-                    container_states = defaultdict(int)
-                    
-                    for container in containers:
-                        container_states[container.get('State', 'unknown')] += 1
-                        
-                        if container.get('State') == 'running':
-                            self._collect_container_stats(
-                                container.get('Id', '')[:12],
-                                container.get('Names', ['unknown'])[0],
-                                'podman'
-                            )
-                    
-                    for state, count in container_states.items():
-                        self.container_count.labels(runtime='podman', state=state).set(count)
-                
-                self.collection_success.labels(collector='podman').set(1)
-                
-        except Exception as e:
-            logger.error(f"Error collecting Podman metrics: {e}")
-            self.collection_errors.labels(collector='podman').inc()
-            self.collection_success.labels(collector='podman').set(0)
+        # With podman.socket enabled the libpod API serves the listing and
+        # every running container's stats in one request each; otherwise
+        # fall back to the podman CLI
+        use_api = os.path.exists(PODMAN_SOCKET)
+        if use_api:
+            containers = _unix_get_json(PODMAN_SOCKET, f'{PODMAN_API}/containers/json?all=true')
+        else:
+            result = subprocess.run(['podman', 'ps', '-a', '--format', 'json'],
+                                  timeout=5, **_RUN_KW)
+            containers = json_loads(result.stdout) if result.returncode == 0 else None
+        
+        if containers is not None:
+            container_states = StateCounter(container.get('State', 'unknown') for container in containers)
+            
+            if use_api:
+                if container_states['running']:
+                    self._collect_podman_api_stats(container_stats)
+            else:
+                self._gather_container_stats([
+                    partial(self._collect_container_stats,
+                            container.get('Id', '')[:12],
+                            container.get('Names', ['unknown'])[0],
+                            'podman')
+                    for container in containers if container.get('State') == 'running'
+                ], container_stats)
+            
+            for state, count in container_states.items():
+                self.container_count.labels(runtime='podman', state=state).set(count)
+    
+    def _collect_podman_api_stats(self, container_stats):
+        """Collect usage for all running Podman containers from one libpod stats request"""
+        # Values arrive numeric: CPU in percent, memory in bytes
+        response = _unix_get_json(PODMAN_SOCKET, f'{PODMAN_API}/containers/stats?stream=false', timeout=10)
+        for stats in response.get('Stats') or ():
+            container_stats.append((
+                stats.get('Name', 'unknown'),
+                stats.get('ContainerID', '')[:12],
+                'podman',
+                stats.get('CPU', 0.0),
+                stats.get('MemUsage'),
+                stats.get('MemLimit'),
+            ))
     
     def _collect_container_stats(self, container_id, container_name, runtime):
-        """Collect individual container statistics"""
+        """Collect individual container statistics from the runtime CLI, or None"""
         try:
             # Get container stats
             cmd = [runtime, 'stats', container_id, '--no-stream', '--format', 'json']
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=5)
+            result = subprocess.run(cmd, timeout=5, **_RUN_KW)
             
             if result.returncode == 0:
-                stats = json.loads(result.stdout)
+                stats = json_loads(result.stdout)
                 if isinstance(stats, list):
                     stats = stats[0]
                 
@@ -1512,91 +3079,112 @@ class EnhancedProxmoxExporter:
                 if isinstance(cpu_str, str):
                     cpu_percent = float(cpu_str.rstrip('%'))
                 
-                self.container_cpu.labels(
-                    name=container_name,
-                    id=container_id,
-                    runtime=runtime
-                ).set(cpu_percent)
-                
                 # Parse memory usage
+                used_bytes = limit_bytes = None
                 mem_usage = stats.get('MemUsage', '')
                 if '/' in mem_usage:
                     used, limit = mem_usage.split('/')
                     # Parse memory values (handle different units)
                     used_bytes = self._parse_memory_string(used)
                     limit_bytes = self._parse_memory_string(limit)
-                    
-                    self.container_memory.labels(
-                        name=container_name,
-                        id=container_id,
-                        runtime=runtime
-                    ).set(used_bytes)
-                    
-                    self.container_memory_limit.labels(
-                        name=container_name,
-                        id=container_id,
-                        runtime=runtime
-                    ).set(limit_bytes)
-        except:
+                
+                return container_name, container_id, runtime, cpu_percent, used_bytes, limit_bytes
+        except (OSError, subprocess.SubprocessError, ValueError, IndexError):
             pass
+        return None
     
     def _parse_memory_string(self, mem_str):
         """Parse memory string like '1.5GiB' to bytes"""
         mem_str = mem_str.strip()
-        units = {'B': 1, 'KiB': 1024, 'MiB': 1024**2, 'GiB': 1024**3,
-                'KB': 1000, 'MB': 1000**2, 'GB': 1000**3}
-        
-        for unit, multiplier in units.items():
-            if unit in mem_str:
-                value = float(mem_str.replace(unit, '').strip())
-                return int(value * multiplier)
-        return 0
+        # The unit is whatever follows the number, so one lookup replaces
+        # probing for each unit name in turn
+        split = len(mem_str.rstrip('BKMGTPEikb'))
+        multiplier = _MEMORY_UNITS.get(mem_str[split:].strip())
+        if multiplier is None:
+            return 0
+        return int(float(mem_str[:split]) * multiplier)
     
     def collect_all_metrics(self):
         """Collect all metrics based on detected features"""
         logger.debug("Starting metric collection cycle...")
         
-        collectors = [
-            ('base', self.collect_base_metrics),
-        ]
-        
-        # Add conditional collectors
-        if self.features['sensors']:
-            collectors.append(('temperature', self.collect_temperature_metrics))
-        if self.features['systemd']:
-            collectors.append(('systemd', self.collect_systemd_metrics))
-        if self.features['mdadm']:
-            collectors.append(('mdadm', self.collect_mdadm_metrics))
-        if self.features['docker'] or self.features['podman']:
-            collectors.append(('containers', self.collect_container_metrics))
+        # Slow collectors only run on their own cadence; their last values stay
+        # exported in between
+        now = time.monotonic()
+        collectors = {}
+        for name, func in self.collectors.items():
+            if name in COLLECTOR_INTERVALS:
+                if now < self.collector_due.get(name, 0):
+                    continue
+                # Half an interval of slack keeps loop jitter from skipping a whole extra cycle
+                self.collector_due[name] = now + COLLECTOR_INTERVALS[name] - COLLECTION_INTERVAL / 2
+            collectors[name] = func
         
         # Execute collectors (parallel or serial)
         if PARALLEL_COLLECTORS and self.executor:
-            futures = []
-            for name, func in collectors:
-                future = self.executor.submit(func)
-                futures.append((name, future))
+            # A collector that outlived the last cycle's timeout is still on its
+            # worker; a second copy would race it on the same collectors and caches
+            for name in [name for name in collectors if name in self.collectors_running]:
+                del collectors[name]
+                logger.warning("Collector %s skipped: previous run still in progress", name)
+                self.collection_errors.labels(collector=name).inc()
+            self.collectors_running.update(collectors)
+            results = self.executor.run_all(
+                [partial(self._run_tracked, name, func) for name, func in collectors.items()], timeout=30)
             
-            # Wait for completion
-            for name, future in futures:
-                try:
-                    future.result(timeout=30)
-                except Exception as e:
-                    logger.error(f"Collector {name} failed: {e}")
+            for name, result in zip(collectors, results):
+                if result is None:
+                    logger.error("Collector %s failed: timed out", name)
+                    self.collection_errors.labels(collector=name).inc()
+                elif not result[0]:
+                    logger.error("Collector %s failed: %s", name, result[1])
                     self.collection_errors.labels(collector=name).inc()
         else:
-            for name, func in collectors:
+            for name, func in collectors.items():
                 try:
                     func()
                 except Exception as e:
-                    logger.error(f"Collector {name} failed: {e}")
+                    logger.error("Collector %s failed: %s", name, e)
                     self.collection_errors.labels(collector=name).inc()
         
         # Clear expired cache entries
         self.cache.clear_expired()
         
+        # Swap in the new exposition in one assignment so a scrape always sees a complete cycle
+        self.exposition = generate_latest(self.registry)
+        self.collected_at = time.monotonic()
+        
         logger.debug("Metric collection cycle completed")
     
+    def _run_tracked(self, name, func):
+        """Run a pooled collector, clearing its in-flight mark however it ends"""
+        try:
+            return func()
+        finally:
+            self.collectors_running.discard(name)
+    
+    def scrape(self):
+        """Exposition for a scrape, collecting first if the loop has gone idle"""
+        self.last_scrape = time.monotonic()
+        # While the loop runs the exposition is never two intervals old, so only
+        # the first scrape after an idle period pays for a collection
+        if self.last_scrape - self.collected_at >= COLLECTION_INTERVAL * 2:
+            with self.collect_lock:
+                # Another scrape may have collected while this one waited
+                if time.monotonic() - self.collected_at >= COLLECTION_INTERVAL * 2:
+                    try:
+                        self.collect_all_metrics()
+                    except Exception as e:
+                        logger.error("Error in on-demand collection: %s", e)
+        return self.exposition
+    
+    def compressed(self, exposition):
+        """gzip of an exposition, compressed once however many scrapers ask for it"""
+        cached = self.exposition_gzip
+        if cached[0] is not exposition:
+            cached = self.exposition_gzip = (exposition, gzip.compress(exposition, compresslevel=6))
+        return cached[1]
+    
     def health_check(self):
         """Health check endpoint"""
         last_collection = time.time() - self.start_time
@@ -1609,35 +3197,63 @@ class EnhancedProxmoxExporter:
         logger.info("Shutting down exporter...")
         if self.executor:
             self.executor.shutdown(wait=True)
+        if self.smart_pool:
+            self.smart_pool.shutdown(wait=False)
+        if self.container_pool:
+            self.container_pool.shutdown(wait=False)
+        if self.nvml_handles is not None:
+            pynvml.nvmlShutdown()
+        if self.ipmi_shell:
+            self.ipmi_shell.close()
+        if self.nvidia_smi:
+            self.nvidia_smi.close()
     
     def run(self):
         """Main loop"""
         # Start HTTP server
-        start_http_server(EXPORTER_PORT, registry=self.registry)
-        logger.info(f"Enhanced Proxmox Exporter started on port {EXPORTER_PORT}")
-        logger.info(f"Metrics available at http://0.0.0.0:{EXPORTER_PORT}/metrics")
-        logger.info(f"Active features: {[k for k,v in self.features.items() if v]}")
+        start_snapshot_server(EXPORTER_PORT, self)
+        logger.info("Enhanced Proxmox Exporter started on port %s", EXPORTER_PORT)
+        logger.info("Metrics available at http://0.0.0.0:%s/metrics", EXPORTER_PORT)
+        logger.info("Active features: %s", [k for k,v in self.features.items() if v])
         
         # Initial collection
-        self.collect_all_metrics()
+        next_collection = time.monotonic()
+        with self.collect_lock:
+            self.collect_all_metrics()
         
-        # Collection loop
+        # Collection loop on absolute deadlines, so collection time does not push
+        # later cycles back; wakes immediately when a shutdown signal arrives
         while True:
+            next_collection += COLLECTION_INTERVAL
+            delay = next_collection - time.monotonic()
+            if delay < 0:
+                # Overran a whole interval: start now rather than bursting to catch up
+                logger.warning("Collection overran the %ss interval by %.1fs; skipping missed cycles",
+                               COLLECTION_INTERVAL, -delay)
+                next_collection = time.monotonic()
+                delay = 0
+            if shutdown_requested.wait(delay):
+                break
+            if SCRAPE_IDLE_TIMEOUT and time.monotonic() - self.last_scrape > SCRAPE_IDLE_TIMEOUT:
+                continue  # nobody is scraping; the next scrape collects on demand
             try:
-                time.sleep(COLLECTION_INTERVAL)
-                self.collect_all_metrics()
+                with self.collect_lock:
+                    self.collect_all_metrics()
             except KeyboardInterrupt:
                 break
             except Exception as e:
-                logger.error(f"Error in collection loop: {e}")
-                time.sleep(5)  # Brief pause before retry
+                logger.error("Error in collection loop: %s", e)
+                shutdown_requested.wait(5)  # Brief pause before retry
         
+        if shutdown_requested.is_set():
+            logger.info("Shutdown signal received")
         self.shutdown()
 
 def signal_handler(signum, frame):
     """Handle shutdown signals"""
-    logger.info(f"Received signal {signum}")
-    sys.exit(0)
+    # Only flag the request here: logging takes a lock that a collector thread
+    # may be holding when the signal is delivered
+    shutdown_requested.set()
 
 def main():
     """Main entry point"""
@@ -1649,7 +3265,7 @@ def main():
         # Check for root (optional but recommended)
         if os.geteuid() != 0:
             logger.warning("Not running as root. Some metrics may be unavailable.")
-            logger.warning("For full functionality, run with: sudo python3 %s" % sys.argv[0])
+            logger.warning("For full functionality, run with: sudo python3 %s", sys.argv[0])
         
         # Create and run exporter
         exporter = EnhancedProxmoxExporter()
@@ -1658,7 +3274,7 @@ def main():
     except KeyboardInterrupt:
         logger.info("Exporter stopped by user")
     except Exception as e:
-        logger.error(f"Fatal error: {e}")
+        logger.error("Fatal error: %s", e)
         raise
 
 if __name__ == '__main__':
@@ -0,0 +1,96 @@
+"""Regression tests for procfs tables longer than one seq_file page"""
+
+import importlib.util
+import os
+import socket
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+MODULE_PATH = Path(__file__).resolve().parent.parent / 'proxmox-node-exporter.py'
+spec = importlib.util.spec_from_file_location('proxmox_node_exporter', MODULE_PATH)
+exporter = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(exporter)
+
+PAGE = 4096
+
+
+def _paged_pread(real_pread):
+    """os.pread that, like seq_file, never returns more than a page per call"""
+    def pread(fd, size, offset):
+        return real_pread(fd, min(size, PAGE), offset)
+    return pread
+
+
+@unittest.skipUnless(os.path.exists('/proc/net/tcp'), 'needs Linux procfs')
+class SocketTableTest(unittest.TestCase):
+    def setUp(self):
+        self.sockets = []
+        for _ in range(200):
+            sock = socket.socket()
+            sock.bind(('127.0.0.1', 0))
+            sock.listen()
+            self.sockets.append(sock)
+
+    def tearDown(self):
+        for sock in self.sockets:
+            sock.close()
+        exporter._proc_fds.pop('/proc/net/tcp', None)
+
+    def test_read_proc_returns_whole_tcp_table(self):
+        with open('/proc/net/tcp', 'rb') as f:
+            expected = f.read().count(b'\n')
+        self.assertGreater(expected, 200)
+        data = exporter._read_proc('/proc/net/tcp')
+        # Sockets may come and go between the two reads, but never ~180 of them
+        self.assertGreater(data.count(b'\n'), 200)
+
+    def test_count_sockets_sees_every_listener(self):
+        tcp_states, _ = exporter.EnhancedProxmoxExporter._count_sockets(None)
+        self.assertGreaterEqual(tcp_states['LISTEN'], 200)
+
+
+class PagedReadTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        patcher = mock.patch.object(exporter.os, 'pread', _paged_pread(os.pread))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def write(self, name, data):
+        path = os.path.join(self.tmp.name, name)
+        with open(path, 'wb') as f:
+            f.write(data)
+        self.addCleanup(exporter._proc_fds.pop, path, None)
+        return path
+
+    def test_short_reads_are_not_eof(self):
+        data = b''.join(b'%05d some proc table row padding\n' % i for i in range(1000))
+        self.assertGreater(len(data), PAGE * 5)
+        self.assertEqual(exporter._read_proc(self.write('table', data)), data)
+
+    def test_mount_table_longer_than_a_page(self):
+        # A PVE node with many ZFS datasets
+        mounts = b''.join(b'rpool/data/subvol-%d-disk-0 /rpool/data/subvol-%d-disk-0 zfs rw,xattr,posixacl 0 0\n' % (i, i)
+                          for i in range(300))
+        self.assertGreater(len(mounts), PAGE * 5)
+        filesystems = b'nodev\tproc\n\text4\n'
+        partitions = exporter._parse_mounts(exporter._read_proc(self.write('mounts', mounts)),
+                                            exporter._read_proc(self.write('filesystems', filesystems)))
+        self.assertEqual(len(partitions), 300)
+        self.assertEqual(partitions[-1][1], '/rpool/data/subvol-299-disk-0')
+
+    def test_diskstats_longer_than_a_page(self):
+        # A host with many zvols
+        diskstats = b''.join(b' 230 %d zd%d 1 2 3 4 5 6 7 8 0 9 10 0 0 0 0 0 0\n' % (i * 16, i * 16)
+                             for i in range(300))
+        self.assertGreater(len(diskstats), PAGE * 3)
+        devices = [line.split()[2] for line in exporter._read_proc(self.write('diskstats', diskstats)).splitlines()]
+        self.assertEqual(len(devices), 300)
+        self.assertEqual(devices[-1], b'zd4784')
+
+
+if __name__ == '__main__':
+    unittest.main()